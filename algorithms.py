@@ -1,165 +1,765 @@
-import math
-from queue import PriorityQueue
-from queue import Queue
-from collections import deque
-import pygame
-
-DISTANCE = 1
-
-def manhattan_distance(p1, p2):
-    x1, y1 = p1
-    x2, y2 = p2
-    return abs(x1 - x2) + abs(y1 - y2)
-
-def reconstruct_path(came_from, current, draw, start = None):
-    while current in came_from and not current is start:
-        current = came_from[current]
-        current.make_path()
-        draw()
-
-def a_star(draw, grid, start, end):
-    count = 0
-    open_set = PriorityQueue()
-    open_set.put((0, count, start))
-    came_from = {}
-    g_score = {node: float("inf") for row in grid for node in row}
-    g_score[start] = 0
-
-    f_score = {node: float("inf") for row in grid for node in row}
-    f_score[start] = manhattan_distance(start.get_pos(), end.get_pos())
-
-    open_set_hash = {start}
-
-    while not open_set.empty():
-        for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-            
-        current = open_set.get()[2]
-        open_set_hash.remove(current)
-
-        if current == end:
-            reconstruct_path(came_from, end, draw)
-            start.make_start()
-            end.make_end()
-            return True
-        
-        for neighbor in current.get_neighbors():
-            temp_g_score = g_score[current] + DISTANCE
-            if temp_g_score < g_score[neighbor]:
-                came_from[neighbor] = current
-                g_score[neighbor] = temp_g_score
-                f_score[neighbor] = temp_g_score + manhattan_distance(neighbor.get_pos(), end.get_pos())
-                if neighbor not in open_set_hash:
-                    count += 1
-                    open_set.put((f_score[neighbor], count, neighbor))
-                    open_set_hash.add(neighbor)
-                    neighbor.make_open()
-        draw()
-
-        if current != start:
-            current.make_closed()
-    return False
-    
-def dijkstra(draw, grid, start, end):
-    count = 0
-    pq = PriorityQueue()
-    pq.put((0, count, start))
-    prev = {}
-    dist = {node: float("inf") for row in grid for node in row}
-    dist[start] = 0
-
-    pq_hash = {start}
-
-    while not pq.empty():
-
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-
-        current = pq.get()[2]
-        pq_hash.remove(current)
-
-        if current == end:
-            reconstruct_path(prev, end, draw)
-            start.make_start()
-            end.make_end()
-            return True
-
-        for neighbor in current.get_neighbors():
-            alt_dist = dist[current] + DISTANCE
-            if alt_dist < dist[neighbor]:
-                dist[neighbor] = alt_dist
-                prev[neighbor] = current
-                if neighbor not in pq_hash:
-                    count += 1
-                    pq.put((dist[neighbor], count, neighbor))
-                    pq_hash.add(neighbor)
-                    neighbor.make_open()
-                
-        draw()
-
-        if current != start:
-           current.make_closed()
-
-    return False
-
-def breadth_first_search(draw, start, end):
-    q = Queue()
-    current = start
-    q.put((current, {}))
-    while not q.empty():
-        current, path = q.get()
-
-        if not current == start:
-            current.make_closed()
-
-        if current == end:
-            reconstruct_path(path, end, draw, start)
-            start.make_start()
-            end.make_end()
-            return True
-
-        for neighbor in current.get_neighbors():
-            if not (neighbor.is_closed() or neighbor.is_open()):
-                neighbor.make_open()
-                path[neighbor] = current
-                q.put((neighbor, path))
-
-        draw()
-    return False
-
-
-
-def depth_first_search(draw, start, end):
-    q = deque()
-    current = start
-    q.append((current, {}))
-    while q:
-        current, path = q.pop()
-
-        if not current == start:
-            current.make_closed()
-
-        if current == end:
-            reconstruct_path(path, end, draw, start)
-            start.make_start()
-            end.make_end()
-            return True
-
-        for neighbor in current.get_neighbors():
-            if not (neighbor.is_closed() or neighbor.is_open()):
-                neighbor.make_open()
-                path[neighbor] = current
-                q.append((neighbor, path))
-
-        draw()
-    return False
-
-def kruskals(draw, grid):
-    pass 
-# TODO
-
-def prims(draw, grid):
-    pass 
-# TODO
+import math
+import time
+from collections import deque
+from heapq import heappush, heappop
+import numpy as np
+from grid_engine import CLEAR, OPEN, CLOSED, PATH, ORTHOGONAL, DIAGONAL, ORTHOGONAL_BITS, ALL_BITS, DIAGONAL_LENGTH
+from observers import as_observer
+from components import is_connected
+from disjoint_set import DisjointSet
+from open_set import OpenSet
+
+DISTANCE = 1
+# Walls kruskals checks against the joined cells at once before looping over them
+KRUSKAL_BATCH = 1 << 18
+
+def manhattan_distance(p1, p2):
+    x1, y1 = p1
+    x2, y2 = p2
+    return abs(x1 - x2) + abs(y1 - y2)
+
+def octile_distance(p1, p2):
+    # Length of the shortest 8-connected route with DIAGONAL_LENGTH diagonal steps
+    x1, y1 = p1
+    x2, y2 = p2
+    dx = abs(x1 - x2)
+    dy = abs(y1 - y2)
+    return dx + dy + (DIAGONAL_LENGTH - 2) * min(dx, dy)
+
+def path_cost(grid, path):
+    # What a_star and dijkstra minimise: the cost of every cell stepped onto, with
+    # diagonal steps DIAGONAL_LENGTH times dearer
+    costs = grid.costs
+    total = 0.0
+    for (row, col), (n_row, n_col) in zip(path, path[1:]):
+        length = DIAGONAL_LENGTH if row != n_row and col != n_col else 1.0
+        total += length * float(costs[n_row * grid.cols + n_col])
+    return total
+
+def reconstruct_path(grid, current, observer, start = None, parent = None):
+    parent = (grid.parent if parent is None else parent).data
+    state = grid.state.data
+    watch = observer.watching
+    cells = [current]
+    while parent[current] != -1 and current != start:
+        current = parent[current]
+        state[current] = PATH
+        cells.append(current)
+        if watch:
+            observer.mark(current, PATH)
+            observer.step()
+    observer.finish()
+    cols = grid.cols
+    return [divmod(cell, cols) for cell in reversed(cells)]
+
+def a_star(observer, grid, start, end, diagonal=False, stats=None):
+    # Steps cost grid.costs of the cell stepped onto, times DIAGONAL_LENGTH for
+    # diagonal steps. The heuristic matches the moves and is scaled by the cheapest
+    # cell, so it never overestimates.
+    heuristic = octile_distance if diagonal else manhattan_distance
+    if stats is not None:
+        return instrumented_best_first_search(observer, grid, start, end, diagonal, stats, heuristic)
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    moves = grid.moves
+    costs = grid.costs.data
+    min_cost = float(grid.costs.min())
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    parent = grid.parent.data
+    end_pos = end
+    start = grid.index(start)
+    end = grid.index(end)
+
+    open_set = OpenSet()
+    open_set.push(start, min_cost * heuristic(grid.pos(start), end_pos))
+    g_score_array = np.full(grid.size, np.inf)
+    g_score = g_score_array.data
+    g_score[start] = 0
+
+    state[start] = OPEN
+
+    expanded = 0
+    while open_set:
+        current = open_set.pop()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        if current == end:
+            grid.expanded = expanded
+            return reconstruct_path(grid, end, observer)
+
+        for delta, length in moves[masks[current] & bits]:
+            neighbor = current + delta
+            temp_g_score = g_score[current] + length * costs[neighbor]
+            if temp_g_score < g_score[neighbor]:
+                parent[neighbor] = current
+                g_score[neighbor] = temp_g_score
+                h_score = min_cost * heuristic(grid.pos(neighbor), end_pos)
+                open_set.push(neighbor, temp_g_score + h_score, h_score)
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+        if watch:
+            observer.step()
+    observer.finish()
+    grid.expanded = expanded
+    return None
+    
+def dijkstra(observer, grid, start, end, diagonal=False, stats=None):
+    if stats is not None:
+        return instrumented_best_first_search(observer, grid, start, end, diagonal, stats)
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    moves = grid.moves
+    costs = grid.costs.data
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    parent = grid.parent.data
+    start = grid.index(start)
+    end = grid.index(end)
+
+    pq = OpenSet()
+    pq.push(start, 0)
+    dist_array = np.full(grid.size, np.inf)
+    dist = dist_array.data
+    dist[start] = 0
+
+    state[start] = OPEN
+
+    expanded = 0
+    while pq:
+        current = pq.pop()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        if current == end:
+            grid.expanded = expanded
+            return reconstruct_path(grid, end, observer)
+
+        for delta, length in moves[masks[current] & bits]:
+            neighbor = current + delta
+            alt_dist = dist[current] + length * costs[neighbor]
+            if alt_dist < dist[neighbor]:
+                dist[neighbor] = alt_dist
+                parent[neighbor] = current
+                pq.push(neighbor, alt_dist)
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+
+        if watch:
+            observer.step()
+
+    observer.finish()
+    grid.expanded = expanded
+    return None
+
+def instrumented_best_first_search(observer, grid, start, end, diagonal, stats, heuristic=None):
+    # a_star (with a heuristic) or dijkstra (without) filling in a SearchStats. Kept
+    # apart so the plain loops pay nothing for the counters and clock reads.
+    clock = time.perf_counter
+    search_start = clock()
+    timers = stats.timers
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        stats.total += clock() - search_start
+        return None
+    masks = grid.masks.data
+    moves = grid.moves
+    costs = grid.costs.data
+    min_cost = float(grid.costs.min())
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    parent = grid.parent.data
+    end_pos = end
+    start = grid.index(start)
+    end = grid.index(end)
+
+    open_set = OpenSet()
+    open_set.push(start, min_cost * heuristic(grid.pos(start), end_pos) if heuristic else 0)
+    stats.heap_high_water = max(stats.heap_high_water, 1)
+    g_score_array = np.full(grid.size, np.inf)
+    g_score = g_score_array.data
+    g_score[start] = 0
+
+    state[start] = OPEN
+
+    expanded = 0
+    while open_set:
+        tick = clock()
+        current = open_set.pop()
+        tock = clock()
+        timers["heap"] += tock - tick
+        stats.expanded += 1
+        expanded += 1
+        state[current] = CLOSED
+        if watch:
+            observer.mark(current, CLOSED)
+            tick = clock()
+            timers["observer"] += tick - tock
+
+        if current == end:
+            tick = clock()
+            path = reconstruct_path(grid, end, observer)
+            timers["path"] += clock() - tick
+            stats.total += clock() - search_start
+            grid.expanded = expanded
+            return path
+
+        # Everything in the neighbour loop that is not heuristic, heap or observer
+        # time counts as neighbour generation
+        loop_start = clock()
+        inner = 0.0
+        for delta, length in moves[masks[current] & bits]:
+            neighbor = current + delta
+            temp_g_score = g_score[current] + length * costs[neighbor]
+            if temp_g_score < g_score[neighbor]:
+                stats.generated += 1
+                if state[neighbor] == CLOSED:
+                    stats.reopened += 1
+                parent[neighbor] = current
+                g_score[neighbor] = temp_g_score
+                h_score = 0
+                tick = clock()
+                if heuristic:
+                    h_score = min_cost * heuristic(grid.pos(neighbor), end_pos)
+                    tock = clock()
+                    timers["heuristic"] += tock - tick
+                    inner += tock - tick
+                    tick = tock
+                open_set.push(neighbor, temp_g_score + h_score, h_score)
+                heap_done = clock()
+                timers["heap"] += heap_done - tick
+                inner += heap_done - tick
+                if len(open_set.heap) > stats.heap_high_water:
+                    stats.heap_high_water = len(open_set.heap)
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+                    observed = clock() - heap_done
+                    inner += observed
+                    timers["observer"] += observed
+        timers["neighbors"] += clock() - loop_start - inner
+        if watch:
+            tick = clock()
+            observer.step()
+            timers["observer"] += clock() - tick
+    tick = clock()
+    observer.finish()
+    timers["observer"] += clock() - tick
+    stats.total += clock() - search_start
+    grid.expanded = expanded
+    return None
+
+def breadth_first_search(observer, grid, start, end, diagonal=False):
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    deltas = grid.deltas
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    parent = grid.parent.data
+    start = grid.index(start)
+    end = grid.index(end)
+
+    q = deque([start])
+    state[start] = OPEN
+    expanded = 0
+    while q:
+        current = q.popleft()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        if current == end:
+            grid.expanded = expanded
+            return reconstruct_path(grid, end, observer, start)
+
+        for delta in deltas[masks[current] & bits]:
+            neighbor = current + delta
+            if state[neighbor] == CLEAR:
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+                parent[neighbor] = current
+                q.append(neighbor)
+
+        if watch:
+            observer.step()
+    observer.finish()
+    grid.expanded = expanded
+    return None
+
+
+
+def depth_first_search(observer, grid, start, end, diagonal=False):
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    deltas = grid.deltas
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    parent = grid.parent.data
+    start = grid.index(start)
+    end = grid.index(end)
+
+    q = deque([start])
+    state[start] = OPEN
+    expanded = 0
+    while q:
+        current = q.pop()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        if current == end:
+            grid.expanded = expanded
+            return reconstruct_path(grid, end, observer, start)
+
+        for delta in deltas[masks[current] & bits]:
+            neighbor = current + delta
+            if state[neighbor] == CLEAR:
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+                parent[neighbor] = current
+                q.append(neighbor)
+
+        if watch:
+            observer.step()
+    observer.finish()
+    grid.expanded = expanded
+    return None
+
+def reconstruct_jump_path(grid, current, observer):
+    # Parents link jump points, fill in the straight or diagonal runs between them
+    parent = grid.parent.data
+    state = grid.state.data
+    watch = observer.watching
+    cols = grid.cols
+    cells = [current]
+    while parent[current] != -1:
+        previous = parent[current]
+        row, col = divmod(current, cols)
+        p_row, p_col = divmod(previous, cols)
+        step = ((p_row > row) - (p_row < row)) * cols + (p_col > col) - (p_col < col)
+        while current != previous:
+            current += step
+            state[current] = PATH
+            cells.append(current)
+            if watch:
+                observer.mark(current, PATH)
+                observer.step()
+    observer.finish()
+    return [divmod(cell, cols) for cell in reversed(cells)]
+
+def jump_point_search(observer, grid, start, end, diagonal=False):
+    # Only for grids where every cell costs the same, grid.costs is not read. Diagonal
+    # steps cost DIAGONAL_LENGTH as in a_star.
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    state = grid.state.data
+    parent = grid.parent.data
+    walls = grid.walls.data
+    rows = grid.rows
+    cols = grid.cols
+    heuristic = octile_distance if diagonal else manhattan_distance
+    end_pos = end
+    start = grid.index(start)
+    end = grid.index(end)
+
+    def walkable(row, col):
+        return 0 <= row < rows and 0 <= col < cols and not walls[row * cols + col]
+
+    def jump(row, col, d_row, d_col):
+        while True:
+            row += d_row
+            col += d_col
+            if not walkable(row, col):
+                return -1
+            cell = row * cols + col
+            if cell == end:
+                return cell
+            if diagonal:
+                if d_row and d_col:
+                    if (walkable(row - d_row, col + d_col) and not walkable(row - d_row, col)) or \
+                       (walkable(row + d_row, col - d_col) and not walkable(row, col - d_col)):
+                        return cell
+                    if jump(row, col, d_row, 0) != -1 or jump(row, col, 0, d_col) != -1:
+                        return cell
+                elif d_col:
+                    if (walkable(row + 1, col + d_col) and not walkable(row + 1, col)) or \
+                       (walkable(row - 1, col + d_col) and not walkable(row - 1, col)):
+                        return cell
+                else:
+                    if (walkable(row + d_row, col + 1) and not walkable(row, col + 1)) or \
+                       (walkable(row + d_row, col - 1) and not walkable(row, col - 1)):
+                        return cell
+            elif d_col:
+                if (walkable(row + 1, col) and not walkable(row + 1, col - d_col)) or \
+                   (walkable(row - 1, col) and not walkable(row - 1, col - d_col)):
+                    return cell
+            else:
+                if (walkable(row, col + 1) and not walkable(row - d_row, col + 1)) or \
+                   (walkable(row, col - 1) and not walkable(row - d_row, col - 1)):
+                    return cell
+                # Vertical runs look for horizontal jump points on every step
+                if jump(row, col, 0, 1) != -1 or jump(row, col, 0, -1) != -1:
+                    return cell
+
+    def directions(cell):
+        row, col = divmod(cell, cols)
+        if parent[cell] == -1:
+            offsets = ORTHOGONAL + DIAGONAL if diagonal else ORTHOGONAL
+            return [(d_row, d_col) for d_row, d_col in offsets if walkable(row + d_row, col + d_col)]
+        p_row, p_col = divmod(parent[cell], cols)
+        d_row = (row > p_row) - (row < p_row)
+        d_col = (col > p_col) - (col < p_col)
+        if not diagonal:
+            if d_col:
+                pruned = [(0, d_col), (1, 0), (-1, 0)]
+            else:
+                pruned = [(d_row, 0), (0, 1), (0, -1)]
+        elif d_row and d_col:
+            pruned = [(0, d_col), (d_row, 0), (d_row, d_col)]
+            if not walkable(row - d_row, col):
+                pruned.append((-d_row, d_col))
+            if not walkable(row, col - d_col):
+                pruned.append((d_row, -d_col))
+        elif d_col:
+            pruned = [(0, d_col)]
+            if not walkable(row + 1, col):
+                pruned.append((1, d_col))
+            if not walkable(row - 1, col):
+                pruned.append((-1, d_col))
+        else:
+            pruned = [(d_row, 0)]
+            if not walkable(row, col + 1):
+                pruned.append((d_row, 1))
+            if not walkable(row, col - 1):
+                pruned.append((d_row, -1))
+        return pruned
+
+    open_set = OpenSet()
+    open_set.push(start, heuristic(grid.pos(start), end_pos))
+    g_score = {start: 0}
+    state[start] = OPEN
+
+    expanded = 0
+    while open_set:
+        current = open_set.pop()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        if current == end:
+            grid.expanded = expanded
+            return reconstruct_jump_path(grid, end, observer)
+
+        row, col = divmod(current, cols)
+        for d_row, d_col in directions(current):
+            jump_point = jump(row, col, d_row, d_col)
+            if jump_point == -1:
+                continue
+            j_row, j_col = divmod(jump_point, cols)
+            # A jump runs straight or diagonally, the heuristic gives its exact length
+            temp_g_score = g_score[current] + heuristic((row, col), (j_row, j_col))
+            if temp_g_score < g_score.get(jump_point, math.inf):
+                parent[jump_point] = current
+                g_score[jump_point] = temp_g_score
+                h_score = heuristic((j_row, j_col), end_pos)
+                open_set.push(jump_point, temp_g_score + h_score, h_score)
+                state[jump_point] = OPEN
+                if watch:
+                    observer.mark(jump_point, OPEN)
+        if watch:
+            observer.step()
+    observer.finish()
+    grid.expanded = expanded
+    return None
+
+def join_paths(grid, meet, observer, backward_parent):
+    grid.state[meet] = PATH
+    if observer.watching:
+        observer.mark(meet, PATH)
+    forward = reconstruct_path(grid, meet, observer)
+    backward = reconstruct_path(grid, meet, observer, parent=backward_parent)
+    return forward + backward[-2::-1]
+
+def bidirectional_a_star(observer, grid, start, end, diagonal=False):
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    moves = grid.moves
+    costs = grid.costs.data
+    min_cost = float(grid.costs.min())
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state
+    start_pos = start
+    end_pos = end
+    start = grid.index(start)
+    end = grid.index(end)
+    if start == end:
+        return reconstruct_path(grid, end, observer)
+
+    backward_parent = np.full(grid.size, -1, dtype=np.int32)
+    parents = (grid.parent, backward_parent)
+    targets = (end_pos, start_pos)
+    g_scores = ({start: 0}, {end: 0})
+    open_sets = (OpenSet(), OpenSet())
+    # The costs and heuristic of a_star, which hold in both directions
+    heuristic = octile_distance if diagonal else manhattan_distance
+    open_sets[0].push(start, min_cost * heuristic(start_pos, end_pos))
+    open_sets[1].push(end, min_cost * heuristic(end_pos, start_pos))
+    state[start] = OPEN
+    state[end] = OPEN
+
+    best = math.inf
+    meet = -1
+    expanded = 0
+    while open_sets[0] and open_sets[1]:
+        # No path through the remaining open cells can beat the best meeting point
+        if best <= max(open_sets[0].peek(), open_sets[1].peek()):
+            break
+        side = 0 if len(open_sets[0]) <= len(open_sets[1]) else 1
+        open_set = open_sets[side]
+        parent = parents[side]
+        g_score = g_scores[side]
+        other_g_score = g_scores[1 - side]
+        target = targets[side]
+
+        current = open_set.pop()
+        state[current] = CLOSED
+        expanded += 1
+        if watch:
+            observer.mark(current, CLOSED)
+
+        for delta, length in moves[masks[current] & bits]:
+            neighbor = current + delta
+            # Forwards a step costs the cell it lands on, backwards the cell it leaves
+            temp_g_score = g_score[current] + length * costs[neighbor if side == 0 else current]
+            if temp_g_score < g_score.get(neighbor, math.inf):
+                parent[neighbor] = current
+                g_score[neighbor] = temp_g_score
+                h_score = min_cost * heuristic(grid.pos(neighbor), target)
+                open_set.push(neighbor, temp_g_score + h_score, h_score)
+                state[neighbor] = OPEN
+                if watch:
+                    observer.mark(neighbor, OPEN)
+                if neighbor in other_g_score and temp_g_score + other_g_score[neighbor] < best:
+                    best = temp_g_score + other_g_score[neighbor]
+                    meet = neighbor
+        if watch:
+            observer.step()
+
+    grid.expanded = expanded
+    if meet == -1:
+        observer.finish()
+        return None
+    return join_paths(grid, meet, observer, backward_parent)
+
+def bidirectional_breadth_first_search(observer, grid, start, end, diagonal=False):
+    observer = as_observer(observer)
+    watch = observer.watching
+    grid.reset_search()
+    if not is_connected(grid, start, end, diagonal):
+        observer.finish()
+        return None
+    masks = grid.masks.data
+    deltas = grid.deltas
+    bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+    state = grid.state.data
+    start = grid.index(start)
+    end = grid.index(end)
+    if start == end:
+        return reconstruct_path(grid, end, observer)
+
+    backward_parent = np.full(grid.size, -1, dtype=np.int32)
+    parents = (grid.parent.data, backward_parent.data)
+    dist_arrays = (np.full(grid.size, -1, dtype=np.int32), np.full(grid.size, -1, dtype=np.int32))
+    dists = (dist_arrays[0].data, dist_arrays[1].data)
+    dists[0][start] = 0
+    dists[1][end] = 0
+    frontiers = ([start], [end])
+    state[start] = OPEN
+    state[end] = OPEN
+
+    expanded = 0
+    while frontiers[0] and frontiers[1]:
+        # Expand a whole level of the smaller frontier, then take the best meeting point
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        parent = parents[side]
+        dist = dists[side]
+        other_dist = dists[1 - side]
+        best = math.inf
+        meet = -1
+        next_frontier = []
+        for current in frontiers[side]:
+            state[current] = CLOSED
+            expanded += 1
+            if watch:
+                observer.mark(current, CLOSED)
+            for delta in deltas[masks[current] & bits]:
+                neighbor = current + delta
+                if other_dist[neighbor] != -1:
+                    if dist[neighbor] == -1:
+                        dist[neighbor] = dist[current] + 1
+                        parent[neighbor] = current
+                    if dist[neighbor] + other_dist[neighbor] < best:
+                        best = dist[neighbor] + other_dist[neighbor]
+                        meet = neighbor
+                elif dist[neighbor] == -1:
+                    dist[neighbor] = dist[current] + 1
+                    parent[neighbor] = current
+                    state[neighbor] = OPEN
+                    if watch:
+                        observer.mark(neighbor, OPEN)
+                    next_frontier.append(neighbor)
+            if watch:
+                observer.step()
+        if meet != -1:
+            grid.expanded = expanded
+            return join_paths(grid, meet, observer, backward_parent)
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+
+    observer.finish()
+    grid.expanded = expanded
+    return None
+
+def start_maze(grid):
+    # Walls everywhere but the cells at even rows and columns, the generators then
+    # knock out the walls between them. Returns the number of maze rows and columns.
+    grid.reset_search()
+    walls = grid.walls_2d()
+    walls[:] = 1
+    walls[::2, ::2] = 0
+    return (grid.rows + 1) // 2, (grid.cols + 1) // 2
+
+def get_maze_entrance(pos):
+    # The cells to clear so that pos joins a maze of start_maze: pos itself, which
+    # then touches a maze cell unless both its row and column are odd, as on the last
+    # row and column of an even sized grid. Then the wall above it is cleared too.
+    row, col = pos
+    if row % 2 and col % 2:
+        return [pos, (row - 1, col)]
+    return [pos]
+
+def get_maze_passages(grid, maze_rows, maze_cols):
+    # Every wall that can be knocked out, with the two maze cells it separates
+    # numbered row by row in the maze
+    ids = np.arange(maze_rows * maze_cols).reshape(maze_rows, maze_cols)
+    cells = np.arange(maze_rows)[:, None] * 2 * grid.cols + np.arange(maze_cols) * 2
+    first = np.concatenate((ids[:, :-1].ravel(), ids[:-1, :].ravel()))
+    second = np.concatenate((ids[:, 1:].ravel(), ids[1:, :].ravel()))
+    between = np.concatenate((cells[:, :-1].ravel() + 1, cells[:-1, :].ravel() + grid.cols))
+    return first, second, between
+
+def kruskals(draw, grid, seed=None):
+    # Maze from a random spanning tree: the walls are visited in random order and
+    # knocked out when the cells on either side aren't joined yet. Walls whose cells
+    # were joined before a batch starts are dropped with NumPy, so the loop mostly
+    # sees walls that do get knocked out. draw is redrawn as for the searches, a
+    # plain callable after every knocked out wall.
+    observer = as_observer(draw)
+    watch = observer.watching
+    rng = np.random.default_rng(seed)
+    maze_rows, maze_cols = start_maze(grid)
+    first, second, between = get_maze_passages(grid, maze_rows, maze_cols)
+    order = rng.permutation(len(between))
+    sets = DisjointSet(maze_rows * maze_cols)
+    union = sets.union
+    walls = grid.walls.data
+    for batch in range(0, len(order), KRUSKAL_BATCH):
+        batch = order[batch:batch + KRUSKAL_BATCH]
+        roots = sets.flatten()
+        batch = batch[roots[first[batch]] != roots[second[batch]]]
+        for a, b, wall in zip(first[batch].tolist(), second[batch].tolist(), between[batch].tolist()):
+            if union(a, b):
+                walls[wall] = 0
+                if watch:
+                    observer.step()
+    grid.update_masks()
+    observer.finish()
+
+def prims(draw, grid, seed=None):
+    # Maze grown from a random cell, always knocking out the wall of lowest random
+    # weight on its border. A border entry packs the weight, the wall and the
+    # direction to step through it into one int, which the heap compares fastest.
+    observer = as_observer(draw)
+    watch = observer.watching
+    rng = np.random.default_rng(seed)
+    maze_rows, maze_cols = start_maze(grid)
+    cols = grid.cols
+    size = grid.size
+    weights = rng.integers(0, 1 << 30, size, dtype=np.int32).data
+    shift = (4 * size).bit_length()
+    wall_mask = (1 << shift - 2) - 1
+    # From the wall to the new cell: right, left, down, up
+    steps = (1, -1, cols, -cols)
+    in_maze = np.zeros(size, dtype=np.uint8).data
+    walls = grid.walls.data
+
+    current = 2 * int(rng.integers(maze_rows)) * cols + 2 * int(rng.integers(maze_cols))
+    in_maze[current] = 1
+    border = []
+    while True:
+        col = current % cols
+        if col + 2 < cols and not in_maze[current + 2]:
+            heappush(border, weights[current + 1] << shift | (current + 1) << 2)
+        if col >= 2 and not in_maze[current - 2]:
+            heappush(border, weights[current - 1] << shift | (current - 1) << 2 | 1)
+        if current + 2 * cols < size and not in_maze[current + 2 * cols]:
+            heappush(border, weights[current + cols] << shift | (current + cols) << 2 | 2)
+        if current >= 2 * cols and not in_maze[current - 2 * cols]:
+            heappush(border, weights[current - cols] << shift | (current - cols) << 2 | 3)
+        while border:
+            key = heappop(border)
+            wall = key >> 2 & wall_mask
+            current = wall + steps[key & 3]
+            if not in_maze[current]:
+                break
+        else:
+            break
+        in_maze[current] = 1
+        walls[wall] = 0
+        if watch:
+            observer.step()
+    grid.update_masks()
+    observer.finish()
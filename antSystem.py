@@ -1,149 +1,523 @@
-from random import randint
-import numpy as np
-
-def ant_system(locs):
-    n_locs = len(locs)
-
-    n_ants = n_locs
-    alpha = 1.0
-    beta = 3.0
-    rho = 0.5
-
-    nn_path, nn_path_length = get_nn_path(locs)
-    tau0 = n_ants/nn_path_length
-
-    pheromone_level = initialize_pheromone_level(n_locs, tau0)
-    visibility = get_visibility(locs)
-
-    min_path_length = 100000000
-
-    max_iterations = 100
-
-    for iteration in range(max_iterations):
-        path_collection = []
-        path_length_collection = []
-        for ant in range(n_ants):
-            path = generate_path(pheromone_level, visibility, alpha, beta)
-            path_length = get_path_length(path, locs)
-            if path_length < min_path_length:
-                min_path_length = path_length
-                yield iteration, ant, path_length, path
-
-            path_collection.append(path)
-            path_length_collection.append(path_length)
-
-        delta_pheromone_level = compute_delta_pheromone_level(path_collection,
-                                                        path_length_collection)
-        pheromone_level = update_pheromone_level(pheromone_level,
-                                               delta_pheromone_level, rho)
-        
-def get_nn_path(locs):
-    n_locs = len(locs)
-    current_loc_index = randint(0, n_locs-1)
-
-    nn_path = np.ones(n_locs, dtype=int)*-2
-    nn_path[0] = current_loc_index
-
-    for i in range(1, n_locs):
-        shortest_edge = np.inf
-        nn_index = -1
-        current_loc = locs[current_loc_index]
-        for j in range(n_locs):
-            if not j in nn_path:
-                tmp_loc = locs[j]
-                current_edge = np.linalg.norm(np.array(current_loc) -
-                                                            np.array(tmp_loc))
-                if current_edge < shortest_edge:
-                    shortest_edge = current_edge
-                    nn_index = j
-
-        current_loc_index = nn_index
-        nn_path[i] = nn_index
-    nn_path_length = get_path_length(nn_path, locs)
-    return nn_path, nn_path_length
-
-def get_path_length(path, locs):
-    n_locs = len(locs)
-
-    length = 0
-
-    for i in range(n_locs):
-
-        loc1 = locs[path[i]]
-        loc2 = locs[path[(i+1)%n_locs]]
-        length += np.linalg.norm(np.array(loc1) - np.array(loc2))
-
-    return length
-
-def initialize_pheromone_level(n_locs, tau0):
-    return tau0*np.ones((n_locs, n_locs))
-
-def get_visibility(locs):
-    n_locs = len(locs)
-    visibility = np.zeros((n_locs, n_locs))
-
-    for i in range(n_locs):
-        for j in range(n_locs):
-            locs_i = locs[i]
-            locs_j = locs[j]
-
-            edge_len = np.linalg.norm(np.array(locs_i) - np.array(locs_j))
-
-            if not edge_len == 0:
-                visibility[i,j] = 1/edge_len
-
-    return visibility
-
-def generate_path(pheromone_level, visibility, alpha, beta):
-    n_locs = len(pheromone_level)
-    start_node = randint(0, n_locs-1)
-    path = np.zeros(n_locs, dtype=int)
-    tabu = [start_node]
-
-    for i in range(n_locs-1):
-        node = GetNode(tabu, pheromone_level, visibility, alpha, beta)
-        path[i] = node
-        tabu.append(node)
-    path[n_locs-1] = start_node
-    return path
-
-def GetNode(tabu, pheromone_level, visibility, alpha, beta):
-    n_locs = len(pheromone_level)
-    from_node = tabu[-1]
-    probability = np.zeros(n_locs)
-
-    den_sum = 0
-    for loc in range(n_locs):
-        if not loc in tabu:
-            den_tau_alpha = pheromone_level[loc, from_node]**alpha
-            den_eta_beta = visibility[loc, from_node]**beta
-            den_sum += den_tau_alpha * den_eta_beta
-
-    for to_node in range(n_locs):
-        if not to_node in tabu:
-            num_tau_alpha = pheromone_level[to_node, from_node]**alpha
-            num_eta_beta = visibility[to_node, from_node]**beta
-            probability[to_node] = (num_tau_alpha * num_eta_beta) / den_sum
-
-    node = np.random.choice(n_locs, 1, False, probability)
-    return node
-
-
-def compute_delta_pheromone_level(path_collection, path_length_collection):
-    n_ants = len(path_collection)
-    n_locs = len(path_collection[0])
-
-    delta_p_l = np.zeros((n_locs, n_locs))
-
-    for ant in range(n_ants):
-        for loc_index in range(n_locs):
-            pheromone = 1/path_length_collection[ant]
-            #pheromone = [1/path_len for path_len in path_length_collection]
-            from_node = path_collection[ant][loc_index]
-            to_node = path_collection[ant][(loc_index+1)%n_locs]
-            delta_p_l[from_node, to_node] += pheromone
-
-    return delta_p_l
-
-def update_pheromone_level(pheromone_level, delta_pheromone_level, rho):
-    return (1-rho)*pheromone_level + delta_pheromone_level
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+import numpy as np
+from local_search import improve_tour
+
+try:
+    from scipy.spatial.distance import cdist
+except ImportError:
+    cdist = None
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+CANDIDATE_ANTS = 20
+LOCAL_SEARCH_NEIGHBORS = 10
+VARIANTS = ("as", "elitist", "mmas", "acs")
+
+# (alpha, beta, rho) of each colony in multi_colony_ant_system, reused cyclically
+COLONY_SETTINGS = ((1.0, 3.0, 0.5), (1.0, 2.0, 0.3), (1.0, 5.0, 0.1), (2.0, 4.0, 0.5))
+
+class AntSystemConfig:
+    # variant picks the pheromone update: "as" lets every ant deposit, "elitist" adds
+    # elitist_weight deposits on the best tour so far, "mmas" lets only the iteration
+    # best deposit and keeps trails between tau_min and tau_max, "acs" uses the
+    # pseudo-random proportional rule with local updates and a best so far deposit.
+    # n_ants defaults to n_locs, or CANDIDATE_ANTS with candidate lists, and
+    # elitist_weight to n_locs. A run stops after stagnation iterations without
+    # improvement, after time_budget seconds or once a tour of target_length is found.
+    def __init__(self, variant="as", alpha=1.0, beta=3.0, rho=0.5, n_ants=None,
+                 max_iterations=100, n_candidates=None, local_search=None,
+                 elitist_weight=None, p_best=0.05, q0=0.9, xi=0.1, stagnation=None,
+                 time_budget=None, target_length=None, seed=None):
+        self.variant = variant
+        self.alpha = alpha
+        self.beta = beta
+        self.rho = rho
+        self.n_ants = n_ants
+        self.max_iterations = max_iterations
+        self.n_candidates = n_candidates
+        self.local_search = local_search
+        self.elitist_weight = elitist_weight
+        self.p_best = p_best
+        self.q0 = q0
+        self.xi = xi
+        self.stagnation = stagnation
+        self.time_budget = time_budget
+        self.target_length = target_length
+        self.seed = seed
+
+    def replace(self, **options):
+        return AntSystemConfig(**{**vars(self), **options})
+
+def ant_system(locs, config=None, distances=None, **options):
+    # options override single fields of config, e.g. ant_system(locs, variant="mmas").
+    # distances replaces the straight line distances between locs, e.g. with the grid
+    # distances from distance_field.distance_matrix.
+    config = (config or AntSystemConfig()).replace(**options)
+    if config.variant not in VARIANTS:
+        raise ValueError(f"Unknown Ant System variant {config.variant!r}, expected one of {VARIANTS}")
+    n_locs = len(locs)
+    rng = np.random.default_rng(config.seed)
+    if distances is not None:
+        distances = np.asarray(distances, dtype=float)
+        if distances.shape != (n_locs, n_locs) or not np.isfinite(distances).all():
+            raise ValueError("distances must be a finite n_locs x n_locs matrix")
+        colony = DenseColony(distances, config.local_search)
+        n_ants = config.n_ants or n_locs
+    elif config.n_candidates is not None and config.n_candidates < n_locs - 1:
+        # Each location only keeps pheromone towards its n_candidates nearest
+        # neighbours, so memory is O(n_locs * n_candidates) instead of O(n_locs^2)
+        colony = CandidateColony(locs, config.n_candidates, config.local_search)
+        n_ants = min(config.n_ants or CANDIDATE_ANTS, n_locs)
+    else:
+        colony = DenseColony(get_distance_matrix(locs), config.local_search)
+        n_ants = config.n_ants or n_locs
+
+    variant = config.variant
+    alpha = config.alpha
+    rho = config.rho
+    visibility_beta = colony.visibility**config.beta
+    nn_path, nn_path_length = colony.get_nn_path(rng)
+
+    if variant == "mmas":
+        tau0 = 1/(rho*nn_path_length)
+    elif variant == "acs":
+        tau0 = 1/(n_locs*nn_path_length)
+    else:
+        tau0 = n_ants/nn_path_length
+    pheromone_level = tau0*np.ones(colony.shape)
+    q0 = config.q0 if variant == "acs" else 0.0
+    local_update = None
+
+    min_path_length = np.inf
+    best_path = nn_path
+    last_improvement = 0
+    start_time = time.perf_counter()
+
+    for iteration in range(config.max_iterations):
+        weights = get_transition_weights(pheromone_level, visibility_beta, alpha)
+        if variant == "acs":
+            local_update = get_acs_local_update(pheromone_level, weights, visibility_beta,
+                                                alpha, config.xi, tau0)
+        path_collection = colony.generate_paths(weights, n_ants, rng, q0, local_update)
+        path_length_collection = colony.get_path_lengths(path_collection)
+        if colony.improve is not None:
+            ant = np.argmin(path_length_collection)
+            path_collection[ant] = colony.improve(path_collection[ant])
+            path_length_collection[ant] = colony.get_path_lengths(path_collection[ant:ant + 1])[0]
+        for ant, path_length in enumerate(path_length_collection):
+            if path_length < min_path_length:
+                min_path_length = path_length
+                best_path = path_collection[ant]
+                last_improvement = iteration
+                yield iteration, ant, path_length, best_path
+
+        if variant == "as":
+            delta_pheromone_level = colony.compute_delta(path_collection, path_length_collection)
+            pheromone_level = update_pheromone_level(pheromone_level, delta_pheromone_level, rho)
+        elif variant == "elitist":
+            # A deposit of weight e is the deposit of a tour e times shorter
+            elitist_weight = config.elitist_weight or n_locs
+            delta_pheromone_level = (colony.compute_delta(path_collection, path_length_collection) +
+                                     colony.compute_delta([best_path], [min_path_length/elitist_weight]))
+            pheromone_level = update_pheromone_level(pheromone_level, delta_pheromone_level, rho)
+        elif variant == "mmas":
+            ant = np.argmin(path_length_collection)
+            delta_pheromone_level = colony.compute_delta(path_collection[ant:ant + 1],
+                                                         path_length_collection[ant:ant + 1])
+            pheromone_level = update_pheromone_level(pheromone_level, delta_pheromone_level, rho)
+            tau_min, tau_max = get_mmas_limits(min_path_length, rho, config.p_best, n_locs)
+            np.clip(pheromone_level, tau_min, tau_max, out=pheromone_level)
+        else:
+            # Only the edges of the best tour so far evaporate and receive pheromone
+            delta_pheromone_level = colony.compute_delta([best_path], [min_path_length])
+            edges = delta_pheromone_level > 0
+            pheromone_level[edges] = (1-rho)*pheromone_level[edges] + rho*delta_pheromone_level[edges]
+
+        if config.target_length is not None and min_path_length <= config.target_length:
+            break
+        if config.stagnation is not None and iteration - last_improvement >= config.stagnation:
+            break
+        if config.time_budget is not None and time.perf_counter() - start_time >= config.time_budget:
+            break
+
+def get_mmas_limits(best_path_length, rho, p_best, n_locs):
+    # tau_max is the limit of a trail that gets the best deposit every iteration,
+    # tau_min makes the best tour get built with probability p_best once converged
+    tau_max = 1/(rho*best_path_length)
+    p_decision = p_best**(1/n_locs)
+    average_options = max(n_locs/2 - 1, 1)
+    tau_min = min(tau_max*(1 - p_decision)/(average_options*p_decision), tau_max)
+    return tau_min, tau_max
+
+def get_acs_local_update(pheromone_level, weights, visibility_beta, alpha, xi, tau0):
+    # Every step moves the trails the ants just used towards tau0, so the ants
+    # still building their tours in this iteration are pushed to other edges
+    def local_update(rows, columns):
+        pheromone_level[rows, columns] = (1-xi)*pheromone_level[rows, columns] + xi*tau0
+        weights[rows, columns] = pheromone_level[rows, columns]**alpha * visibility_beta[rows, columns]
+    return local_update
+
+class DenseColony:
+    def __init__(self, distances, local_search=None):
+        self.distances = distances
+        self.shape = distances.shape
+        self.visibility = get_visibility(distances)
+        self.improve = get_dense_local_search(distances, local_search)
+
+    def get_nn_path(self, rng):
+        return get_nn_path(self.distances, self.distances, rng)
+
+    def generate_paths(self, weights, n_ants, rng, q0=0.0, local_update=None):
+        return generate_paths(weights, n_ants, rng, q0, local_update)
+
+    def get_path_lengths(self, paths):
+        return get_path_lengths(paths, self.distances)
+
+    def compute_delta(self, path_collection, path_length_collection):
+        return compute_delta_pheromone_level(path_collection, path_length_collection)
+
+class CandidateColony:
+    def __init__(self, locs, n_candidates, local_search=None):
+        self.points = np.asarray(locs, dtype=float)
+        self.candidates, candidate_distances = get_candidate_lists(self.points, n_candidates)
+        self.shape = self.candidates.shape
+        self.visibility = get_visibility(candidate_distances)
+        self.improve = get_candidate_local_search(self.points, self.candidates, local_search)
+
+    def get_nn_path(self, rng):
+        return get_candidate_nn_path(self.points, self.candidates, rng)
+
+    def generate_paths(self, weights, n_ants, rng, q0=0.0, local_update=None):
+        return generate_candidate_paths(self.points, self.candidates, weights, n_ants, rng,
+                                        q0, local_update)
+
+    def get_path_lengths(self, paths):
+        return get_tour_lengths(self.points, paths)
+
+    def compute_delta(self, path_collection, path_length_collection):
+        return compute_candidate_delta_pheromone_level(self.candidates, path_collection,
+                                                       path_length_collection)
+
+def run_iteration(colony, pheromone_level, visibility_beta, alpha, rho, n_ants, rng):
+    # One plain Ant System iteration, used by the multi-colony workers
+    weights = get_transition_weights(pheromone_level, visibility_beta, alpha)
+    path_collection = colony.generate_paths(weights, n_ants, rng)
+    path_length_collection = colony.get_path_lengths(path_collection)
+    delta_pheromone_level = colony.compute_delta(path_collection, path_length_collection)
+    pheromone_level = update_pheromone_level(pheromone_level, delta_pheromone_level, rho)
+    return path_collection, path_length_collection, pheromone_level
+
+def multi_colony_ant_system(locs, n_colonies=4, max_iterations=100, migration_interval=10,
+                            migration_rate=0.1, colony_settings=COLONY_SETTINGS, seed=None,
+                            max_workers=None):
+    # Independent colonies run in worker processes for migration_interval iterations
+    # at a time, then trade pheromone and the best tour found so far
+    n_locs = len(locs)
+    n_ants = n_locs
+    rng = np.random.default_rng(seed)
+
+    distances = get_distance_matrix(locs)
+    nn_path, nn_path_length = get_nn_path(locs, distances, rng)
+    tau0 = n_ants/nn_path_length
+    pheromone_levels = [initialize_pheromone_level(n_locs, tau0) for colony in range(n_colonies)]
+
+    min_path_length = np.inf
+    best_path = nn_path
+
+    with ProcessPoolExecutor(max_workers, initializer=init_colony_worker, initargs=(distances,)) as executor:
+        for first_iteration in range(0, max_iterations, migration_interval):
+            n_iterations = min(migration_interval, max_iterations - first_iteration)
+            futures = {}
+            for colony in range(n_colonies):
+                settings = colony_settings[colony % len(colony_settings)]
+                future = executor.submit(run_colony_epoch, pheromone_levels[colony], settings,
+                                         first_iteration, n_iterations, rng.integers(2**63))
+                futures[future] = colony
+
+            for future in as_completed(futures):
+                pheromone_levels[futures[future]], improvements = future.result()
+                for iteration, ant, path_length, path in improvements:
+                    if path_length < min_path_length:
+                        min_path_length = path_length
+                        best_path = path
+                        yield iteration, ant, path_length, path
+
+            pheromone_levels = migrate_pheromone(pheromone_levels, best_path, min_path_length,
+                                                 migration_rate)
+
+def get_dense_local_search(distances, local_search):
+    # Polishes the best tour of each iteration before it deposits pheromone
+    if local_search is None:
+        return None
+    rows = distances.tolist()
+    n_neighbors = min(LOCAL_SEARCH_NEIGHBORS, len(rows) - 1)
+    # Each location left out of its own list, which sorting alone doesn't do when a
+    # duplicate location comes before it
+    others = distances.copy()
+    np.fill_diagonal(others, np.inf)
+    neighbors = np.argsort(others, axis=1, kind="stable")[:, :n_neighbors].tolist()
+    return lambda path: improve_tour(path, lambda a, b: rows[a][b], neighbors, local_search)
+
+def get_candidate_local_search(points, candidates, local_search):
+    if local_search is None:
+        return None
+    coordinates = points.tolist()
+    neighbors = candidates.tolist()
+    distance = lambda a, b: ((coordinates[a][0] - coordinates[b][0])**2 +
+                             (coordinates[a][1] - coordinates[b][1])**2)**0.5
+    return lambda path: improve_tour(path, distance, neighbors, local_search)
+
+colony_data = {}
+
+def init_colony_worker(distances):
+    colony_data["colony"] = DenseColony(distances)
+
+def run_colony_epoch(pheromone_level, settings, first_iteration, n_iterations, seed):
+    colony = colony_data["colony"]
+    alpha, beta, rho = settings
+    n_ants = len(colony.distances)
+    rng = np.random.default_rng(seed)
+    visibility_beta = colony.visibility**beta
+
+    improvements = []
+    min_path_length = np.inf
+    for iteration in range(first_iteration, first_iteration + n_iterations):
+        path_collection, path_length_collection, pheromone_level = run_iteration(
+            colony, pheromone_level, visibility_beta, alpha, rho, n_ants, rng)
+        ant = int(np.argmin(path_length_collection))
+        if path_length_collection[ant] < min_path_length:
+            min_path_length = path_length_collection[ant]
+            improvements.append((iteration, ant, min_path_length, path_collection[ant]))
+    return pheromone_level, improvements
+
+def migrate_pheromone(pheromone_levels, best_path, best_path_length, migration_rate):
+    # Ring topology: each colony blends in its neighbour's trails, then every colony
+    # gets a deposit on the best tour found by any of them
+    n_colonies = len(pheromone_levels)
+    deposit = compute_delta_pheromone_level([best_path], [best_path_length])
+    return [(1-migration_rate)*pheromone_levels[colony] +
+            migration_rate*pheromone_levels[colony - 1] + deposit
+            for colony in range(n_colonies)]
+
+def get_distance_matrix(locs):
+    points = np.asarray(locs, dtype=float)
+    if cdist is not None:
+        return cdist(points, points)
+    difference = points[:, None, :] - points[None, :, :]
+    return np.sqrt((difference**2).sum(axis=-1))
+
+def get_nn_path(locs, distances=None, rng=None):
+    # The tour starts at a random location drawn from rng
+    if distances is None:
+        distances = get_distance_matrix(locs)
+    if rng is None:
+        rng = np.random.default_rng()
+    n_locs = len(locs)
+    current_loc_index = rng.integers(n_locs)
+
+    nn_path = np.ones(n_locs, dtype=int)*-2
+    nn_path[0] = current_loc_index
+    unvisited = np.ones(n_locs, dtype=bool)
+    unvisited[current_loc_index] = False
+
+    for i in range(1, n_locs):
+        edges = np.where(unvisited, distances[current_loc_index], np.inf)
+        current_loc_index = np.argmin(edges)
+        nn_path[i] = current_loc_index
+        unvisited[current_loc_index] = False
+    nn_path_length = get_path_length(nn_path, distances)
+    return nn_path, nn_path_length
+
+def get_path_length(path, distances):
+    return distances[path, np.roll(path, -1)].sum()
+
+def get_path_lengths(paths, distances):
+    return distances[paths, np.roll(paths, -1, axis=1)].sum(axis=1)
+
+def initialize_pheromone_level(n_locs, tau0):
+    return tau0*np.ones((n_locs, n_locs))
+
+def get_visibility(distances):
+    visibility = np.zeros_like(distances)
+    np.divide(1, distances, out=visibility, where=distances != 0)
+    return visibility
+
+def get_transition_weights(pheromone_level, visibility_beta, alpha):
+    # tau^alpha * eta^beta, computed once per iteration and shared by all ants
+    return (pheromone_level**alpha * visibility_beta).astype(np.float32)
+
+def generate_paths(weights, n_ants, rng, q0=0.0, local_update=None):
+    # All ants take their next step together. After i steps every ant has the same
+    # number of unvisited locations left, kept in the first n_locs - i columns of
+    # remaining, so the probabilities are one (n_ants x n_locs - i) array.
+    n_locs = len(weights)
+    flat_weights = weights.ravel()
+    ants = np.arange(n_ants)
+    paths = np.zeros((n_ants, n_locs), dtype=int)
+    remaining = np.tile(np.arange(n_locs), (n_ants, 1))
+
+    position = rng.integers(n_locs, size=n_ants)
+    current = remaining[ants, position]
+    paths[:, 0] = current
+    remaining[ants, position] = remaining[:, -1]
+
+    for i in range(1, n_locs):
+        n_remaining = n_locs - i
+        candidates = remaining[:, :n_remaining]
+        probability = np.take(flat_weights, current[:, None] * n_locs + candidates)
+        if q0:
+            greedy = np.argmax(probability, axis=1)
+        np.cumsum(probability, axis=1, out=probability)
+        threshold = rng.random(n_ants, dtype=np.float32) * probability[:, -1]
+        # With all weights zero (duplicate locations) this picks the first candidate
+        position = np.argmax(probability > threshold[:, None], axis=1)
+        if q0:
+            # Pseudo-random proportional rule: exploit the best edge with probability q0
+            position = np.where(rng.random(n_ants) < q0, greedy, position)
+        previous = current
+        current = candidates[ants, position]
+        if local_update is not None:
+            local_update(previous, current)
+        paths[:, i] = current
+        remaining[ants, position] = remaining[:, n_remaining - 1]
+    return paths
+
+
+def compute_delta_pheromone_level(path_collection, path_length_collection):
+    paths = np.asarray(path_collection)
+    n_locs = paths.shape[1]
+
+    delta_p_l = np.zeros((n_locs, n_locs))
+    pheromone = 1/np.asarray(path_length_collection)
+    np.add.at(delta_p_l, (paths, np.roll(paths, -1, axis=1)), pheromone[:, None])
+
+    return delta_p_l
+
+def update_pheromone_level(pheromone_level, delta_pheromone_level, rho):
+    return (1-rho)*pheromone_level + delta_pheromone_level
+
+def get_candidate_lists(locs, n_candidates):
+    # The n_candidates nearest other locations of every location, closest first
+    points = np.asarray(locs, dtype=float)
+    n_locs = len(points)
+    if cKDTree is None:
+        return get_bucket_candidate_lists(points, n_candidates)
+    distances, candidates = cKDTree(points).query(points, k=n_candidates + 1)
+    # Drop each location itself, or the farthest hit when a duplicate shadowed it
+    keep = candidates != np.arange(n_locs)[:, None]
+    keep[keep.all(axis=1), -1] = False
+    return candidates[keep].reshape(n_locs, n_candidates), distances[keep].reshape(n_locs, n_candidates)
+
+def get_bucket_candidate_lists(points, n_candidates):
+    # Fallback without SciPy: hash the locations into square buckets holding about
+    # two locations each and search outwards ring by ring
+    n_locs = len(points)
+    low = points.min(axis=0)
+    n_side = max(1, int(np.sqrt(n_locs / 2)))
+    size = max(np.ptp(points, axis=0).max() / n_side, 1e-9)
+    cells = np.minimum(((points - low) / size).astype(int), n_side - 1)
+    cell_ids = cells[:, 0] * n_side + cells[:, 1]
+    order = np.argsort(cell_ids, kind="stable")
+    bounds = np.searchsorted(cell_ids[order], np.arange(n_side * n_side + 1))
+
+    candidates = np.empty((n_locs, n_candidates), dtype=int)
+    candidate_distances = np.empty((n_locs, n_candidates))
+    for loc in range(n_locs):
+        c_x, c_y = cells[loc]
+        found = []
+        ring = 0
+        while True:
+            for x in range(max(c_x - ring, 0), min(c_x + ring, n_side - 1) + 1):
+                for y in range(max(c_y - ring, 0), min(c_y + ring, n_side - 1) + 1):
+                    if max(abs(x - c_x), abs(y - c_y)) == ring:
+                        cell = x * n_side + y
+                        found.extend(order[bounds[cell]:bounds[cell + 1]])
+            # Locations outside the searched square are at least ring * size away
+            if len(found) > n_candidates or ring >= n_side:
+                near = np.array(found)
+                near = near[near != loc]
+                near_distances = np.sqrt(((points[near] - points[loc])**2).sum(axis=1))
+                closest = np.argsort(near_distances, kind="stable")[:n_candidates]
+                if near_distances[closest[-1]] <= ring * size or ring >= n_side:
+                    break
+            ring += 1
+        candidates[loc] = near[closest]
+        candidate_distances[loc] = near_distances[closest]
+    return candidates, candidate_distances
+
+def get_nearest_unvisited(points, loc, visited):
+    unvisited = np.flatnonzero(~visited)
+    return unvisited[np.argmin(((points[unvisited] - points[loc])**2).sum(axis=1))]
+
+def get_candidate_nn_path(points, candidates, rng):
+    n_locs = len(points)
+    current_loc_index = rng.integers(n_locs)
+
+    nn_path = np.ones(n_locs, dtype=int)*-2
+    nn_path[0] = current_loc_index
+    visited = np.zeros(n_locs, dtype=bool)
+    visited[current_loc_index] = True
+
+    for i in range(1, n_locs):
+        options = candidates[current_loc_index]
+        open_options = options[~visited[options]]
+        if len(open_options):
+            current_loc_index = open_options[0]
+        else:
+            current_loc_index = get_nearest_unvisited(points, current_loc_index, visited)
+        nn_path[i] = current_loc_index
+        visited[current_loc_index] = True
+    return nn_path, get_tour_lengths(points, nn_path[None, :])[0]
+
+def get_tour_lengths(points, paths):
+    steps = points[np.roll(paths, -1, axis=1)] - points[paths]
+    return np.sqrt((steps**2).sum(axis=-1)).sum(axis=1)
+
+def generate_candidate_paths(points, candidates, weights, n_ants, rng, q0=0.0, local_update=None):
+    n_locs = len(points)
+    ants = np.arange(n_ants)
+    paths = np.zeros((n_ants, n_locs), dtype=int)
+    visited = np.zeros((n_ants, n_locs), dtype=bool)
+
+    current = rng.integers(n_locs, size=n_ants)
+    paths[:, 0] = current
+    visited[ants, current] = True
+
+    for i in range(1, n_locs):
+        options = candidates[current]
+        probability = weights[current] * ~visited[ants[:, None], options]
+        if q0:
+            greedy = np.argmax(probability, axis=1)
+        np.cumsum(probability, axis=1, out=probability)
+        total = probability[:, -1]
+        threshold = rng.random(n_ants, dtype=np.float32) * total
+        slot = np.argmax(probability > threshold[:, None], axis=1)
+        if q0:
+            slot = np.where(rng.random(n_ants) < q0, greedy, slot)
+        next_locs = options[ants, slot]
+        stuck = total <= 0
+        if local_update is not None:
+            local_update(current[~stuck], slot[~stuck])
+        # Ants with every candidate visited go to the nearest unvisited location
+        for ant in np.flatnonzero(stuck):
+            next_locs[ant] = get_nearest_unvisited(points, current[ant], visited[ant])
+        current = next_locs
+        paths[:, i] = current
+        visited[ants, current] = True
+    return paths
+
+def compute_candidate_delta_pheromone_level(candidates, path_collection, path_length_collection):
+    # Only edges that are in the candidate lists carry pheromone
+    paths = np.asarray(path_collection)
+    following = np.roll(paths, -1, axis=1)
+    ant, step, slot = np.nonzero(candidates[paths] == following[..., None])
+
+    delta_p_l = np.zeros(candidates.shape)
+    pheromone = 1/np.asarray(path_length_collection)
+    np.add.at(delta_p_l, (paths[ant, step], slot), pheromone[ant])
+
+    return delta_p_l
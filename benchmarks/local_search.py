@@ -0,0 +1,48 @@
+# Plain Ant System against Ant System with 2-opt / Or-opt on the iteration best tour.
+# The barriers of each map in Grids/ are the locations, as with the 't'/'y' keys in the app.
+# Run from the repository root: python -m benchmarks.local_search
+import argparse
+import glob
+import time
+import numpy as np
+from antSystem import ant_system
+from grid_io import load_grid
+
+
+def run(locs, local_search):
+    start = time.perf_counter()
+    history = []
+    for iteration, ant, path_length, path in ant_system(locs, local_search=local_search):
+        history.append((iteration, path_length))
+    return history, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("maps", nargs="*", default=sorted(glob.glob("Grids/*.grid")))
+    args = parser.parse_args()
+
+    seen = set()
+    print(f"{'map':<30}{'locs':>6}{'local search':>14}{'length':>10}{'iterations':>12}{'time s':>9}")
+    for file_name in args.maps:
+        grid, start, end = load_grid(file_name)
+        if grid.walls.tobytes() in seen:
+            continue
+        seen.add(grid.walls.tobytes())
+        locs = [grid.pos(index) for index in np.flatnonzero(grid.walls)]
+        if len(locs) < 5:
+            continue
+
+        baseline = None
+        for local_search in (None, "2-opt", "or-opt", "both"):
+            history, seconds = run(locs, local_search)
+            length = history[-1][1]
+            if baseline is None:
+                baseline = length
+            # First iteration that is at least as good as plain ACO after all its iterations
+            reached = next((iteration for iteration, path_length in history if path_length <= baseline + 1e-9), "-")
+            print(f"{file_name:<30}{len(locs):>6}{local_search or 'none':>14}{length:>10.1f}{reached:>12}{seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Compares the heapq based OpenSet with the queue.PriorityQueue searches it replaced.
+# Run from the repository root: python -m benchmarks.open_set [--tile N] [--repeat N]
+import argparse
+import glob
+import timeit
+from queue import PriorityQueue
+import numpy as np
+from algorithms import DISTANCE, a_star, dijkstra, manhattan_distance
+from grid_engine import Grid
+from grid_io import load_grid
+
+
+def legacy_a_star(grid, start, end, diagonal=False):
+    end_pos = end
+    start = grid.index(start)
+    end = grid.index(end)
+    count = 0
+    open_set = PriorityQueue()
+    open_set.put((0, count, start))
+    g_score = np.full(grid.size, np.inf)
+    g_score[start] = 0
+    open_set_hash = {start}
+    while not open_set.empty():
+        current = open_set.get()[2]
+        open_set_hash.remove(current)
+        if current == end:
+            return True
+        for neighbor in grid.neighbors(current, diagonal):
+            temp_g_score = g_score[current] + DISTANCE
+            if temp_g_score < g_score[neighbor]:
+                g_score[neighbor] = temp_g_score
+                if neighbor not in open_set_hash:
+                    count += 1
+                    open_set.put((temp_g_score + manhattan_distance(grid.pos(neighbor), end_pos), count, neighbor))
+                    open_set_hash.add(neighbor)
+    return False
+
+
+def legacy_dijkstra(grid, start, end, diagonal=False):
+    start = grid.index(start)
+    end = grid.index(end)
+    count = 0
+    pq = PriorityQueue()
+    pq.put((0, count, start))
+    dist = np.full(grid.size, np.inf)
+    dist[start] = 0
+    pq_hash = {start}
+    while not pq.empty():
+        current = pq.get()[2]
+        pq_hash.remove(current)
+        if current == end:
+            return True
+        for neighbor in grid.neighbors(current, diagonal):
+            alt_dist = dist[current] + DISTANCE
+            if alt_dist < dist[neighbor]:
+                dist[neighbor] = alt_dist
+                if neighbor not in pq_hash:
+                    count += 1
+                    pq.put((alt_dist, count, neighbor))
+                    pq_hash.add(neighbor)
+    return False
+
+
+def tile_grid(grid, start, end, tile):
+    # Repeat the map tile x tile times, start in the first copy and end in the last
+    walls = np.tile(grid.walls_2d(), (tile, tile))
+    offset = (tile - 1) * grid.rows
+    return Grid.from_walls(walls), start, (end[0] + offset, end[1] + offset)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tile", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    searches = [
+        ("a_star", legacy_a_star, lambda grid, start, end: a_star(None, grid, start, end)),
+        ("dijkstra", legacy_dijkstra, lambda grid, start, end: dijkstra(None, grid, start, end)),
+    ]
+    print(f"{'map':<30}{'search':<10}{'legacy ms':>12}{'open set ms':>14}{'speedup':>10}")
+    for file_name in sorted(glob.glob("Grids/*.grid")):
+        grid, start, end = load_grid(file_name)
+        if start is None or end is None:
+            continue
+        grid, start, end = tile_grid(grid, start, end, args.tile)
+        for name, legacy, current in searches:
+            legacy_time = min(timeit.repeat(lambda: legacy(grid, start, end), number=1, repeat=args.repeat))
+            current_time = min(timeit.repeat(lambda: current(grid, start, end), number=1, repeat=args.repeat))
+            print(f"{file_name:<30}{name:<10}{legacy_time * 1000:>12.2f}{current_time * 1000:>14.2f}{legacy_time / current_time:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
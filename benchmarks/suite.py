@@ -0,0 +1,196 @@
+# Runs every search and the Ant System on random grids of growing size and obstacle
+# density and writes one JSON line per run, so results can be diffed between commits.
+# Run from the repository root: python -m benchmarks.suite [--sizes 20 256] [--output bench.jsonl]
+import argparse
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import deque
+import numpy as np
+import algorithms
+from algorithms import (path_cost, a_star, dijkstra, breadth_first_search, depth_first_search,
+                        jump_point_search, bidirectional_a_star, bidirectional_breadth_first_search)
+from antSystem import ant_system
+from grid_engine import Grid
+from open_set import OpenSet
+
+SEARCHES = {
+    "a_star": a_star,
+    "dijkstra": dijkstra,
+    "breadth_first_search": breadth_first_search,
+    "depth_first_search": depth_first_search,
+    "jump_point_search": jump_point_search,
+    "bidirectional_a_star": bidirectional_a_star,
+    "bidirectional_breadth_first_search": bidirectional_breadth_first_search,
+}
+SIZES = (20, 64, 256, 1024, 2048)
+DENSITIES = (0.0, 0.1, 0.2, 0.3)
+
+
+class CountingOpenSet(OpenSet):
+    # Keeps every open set a search creates, OpenSet.count is its number of pushes
+    created = []
+
+    def __init__(self):
+        super().__init__()
+        CountingOpenSet.created.append(self)
+
+
+def random_grid(size, density, rng):
+    # Start is the free cell closest to the top left corner that lies in the big open
+    # region, end the cell of that region farthest down and right
+    walls = rng.random((size, size)) < density
+    walls[0, 0] = False
+    grid = Grid.from_walls(walls)
+    free = np.flatnonzero(grid.walls == 0)
+    for start in free[np.argsort(np.add(*np.divmod(free, size)), kind="stable")]:
+        reachable = flood(grid, start)
+        if 2 * len(reachable) >= len(free):
+            break
+    rows, cols = np.divmod(reachable, size)
+    return grid, grid.pos(start), grid.pos(reachable[np.argmax(rows + cols)])
+
+
+def flood(grid, start):
+    seen = np.zeros(grid.size, dtype=bool)
+    seen[start] = True
+    queue = deque([start])
+    while queue:
+        for neighbor in grid.neighbors(queue.popleft()):
+            if not seen[neighbor]:
+                seen[neighbor] = True
+                queue.append(neighbor)
+    return np.flatnonzero(seen)
+
+
+def count_heap_pushes(search, grid, start, end, diagonal):
+    # Swaps the open set the searches use for one that remembers its instances
+    CountingOpenSet.created = []
+    algorithms.OpenSet = CountingOpenSet
+    try:
+        search(None, grid, start, end, diagonal)
+    finally:
+        algorithms.OpenSet = OpenSet
+    return sum(open_set.count for open_set in CountingOpenSet.created)
+
+
+def measure(run, repeat, memory):
+    # Best of repeat untraced runs for the time, one run under tracemalloc for the peak
+    times = []
+    for attempt in range(repeat):
+        start_time = time.perf_counter()
+        result = run()
+        times.append(time.perf_counter() - start_time)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, min(times), peak
+
+
+def bench_searches(size, density, diagonal, repeat, memory, seed, names):
+    rng = np.random.default_rng(seed)
+    grid, start, end = random_grid(size, density, rng)
+    reference = dijkstra(None, grid, start, end, diagonal)
+    optimal_cost = path_cost(grid, reference) if reference is not None else None
+    for name in names:
+        search = SEARCHES[name]
+        path, seconds, peak = measure(lambda: search(None, grid, start, end, diagonal), repeat, memory)
+        expansions = grid.expanded
+        path_length = len(path) - 1 if path is not None else None
+        cost = path_cost(grid, path) if path is not None else None
+        if cost is None or optimal_cost is None:
+            optimal = cost == optimal_cost
+        else:
+            optimal = abs(cost - optimal_cost) < 1e-6
+        heap_pushes = None
+        if name not in ("breadth_first_search", "depth_first_search", "bidirectional_breadth_first_search"):
+            heap_pushes = count_heap_pushes(search, grid, start, end, diagonal)
+        yield {
+            "benchmark": "search",
+            "algorithm": name,
+            "size": size,
+            "density": density,
+            "diagonal": diagonal,
+            "seed": seed,
+            "found": path is not None,
+            "path_length": path_length,
+            "path_cost": cost,
+            "optimal_cost": optimal_cost,
+            "optimal": optimal,
+            "expansions": expansions,
+            "heap_pushes": heap_pushes,
+            "peak_memory": peak,
+            "time_ms": seconds * 1000,
+        }
+
+
+def bench_ant_system(n_locs, repeat, memory, seed):
+    # The locations are random cells of a square grid, like the barriers in the app
+    rng = np.random.default_rng(seed)
+    side = max(int(np.sqrt(n_locs * 4)), 2)
+    cells = rng.choice(side * side, size=n_locs, replace=False)
+    locs = [divmod(int(cell), side) for cell in cells]
+
+    def run():
+        history = list(ant_system(locs, seed=seed))
+        return history[-1]
+
+    (iteration, ant, path_length, path), seconds, peak = measure(run, repeat, memory)
+    yield {
+        "benchmark": "ant_system",
+        "algorithm": "ant_system",
+        "size": n_locs,
+        "seed": seed,
+        "path_length": float(path_length),
+        "last_improvement": iteration,
+        "peak_memory": peak,
+        "time_ms": seconds * 1000,
+    }
+
+
+def get_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES)
+    parser.add_argument("--densities", nargs="+", type=float, default=DENSITIES)
+    parser.add_argument("--algorithms", nargs="+", choices=tuple(SEARCHES), default=tuple(SEARCHES))
+    parser.add_argument("--diagonal", action="store_true")
+    parser.add_argument("--ant-locations", nargs="*", type=int, default=(20, 50, 100),
+                        help="location counts for ant_system, give none to skip it")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="skip the tracemalloc run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSONL file (default: stdout)")
+    args = parser.parse_args()
+
+    revision = get_revision()
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        runs = [bench_searches(size, density, args.diagonal, args.repeat, args.memory, args.seed, args.algorithms)
+                for size in args.sizes for density in args.densities]
+        runs += [bench_ant_system(n_locs, args.repeat, args.memory, args.seed) for n_locs in args.ant_locations]
+        for run in runs:
+            for result in run:
+                result["revision"] = revision
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
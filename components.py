@@ -0,0 +1,103 @@
+import numpy as np
+from grid_engine import ORTHOGONAL_BITS, ALL_BITS
+from disjoint_set import DisjointSet
+
+
+class ComponentIndex:
+    # Which cells can reach which, so the searches can give up at once when start and
+    # end lie in different regions instead of flooding the region of start. Creating
+    # one registers it with the grid, grid.set_wall then keeps it up to date: a
+    # removed wall joins the regions around it, an added one changes nothing, as
+    # regions that were joined stay a safe guess. When that guess can't tell a
+    # start and end apart after walls were added, the grid is labelled again.
+    def __init__(self, grid, diagonal=False):
+        self.grid = grid
+        self.diagonal = diagonal
+        self.bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+        self.sets = None
+        self.split = False
+        grid.components[diagonal] = self
+
+    def relabel(self):
+        labels = label_components(self.grid, self.diagonal)
+        sets = DisjointSet(self.grid.size)
+        # Every region is a root with all its cells hanging right below it
+        sets.rank_array[labels[labels != sets.parent_array]] = 1
+        sets.parent_array[:] = labels
+        self.sets = sets
+        self.split = False
+
+    def invalidate(self):
+        # The walls changed in any way, label again on the next query
+        self.sets = None
+
+    def set_wall(self, cell, wall):
+        if self.sets is None:
+            return
+        if wall:
+            self.split = True
+            return
+        grid = self.grid
+        for delta in grid.deltas[grid.masks[cell] & self.bits]:
+            self.sets.union(cell, cell + delta)
+
+    def get_roots(self, cell):
+        # The regions a search can start from or end in at cell. A wall cell is left
+        # or entered through its free neighbours.
+        grid = self.grid
+        if not grid.walls[cell]:
+            return {self.sets.find(cell)}
+        return {self.sets.find(cell + delta) for delta in grid.deltas[grid.masks[cell] & self.bits]}
+
+    def connected(self, start, end):
+        # False only when no path can join start and end
+        start = self.grid.index(start)
+        end = self.grid.index(end)
+        if start == end:
+            return True
+        if self.sets is None:
+            self.relabel()
+        if self.get_roots(start).isdisjoint(self.get_roots(end)):
+            return False
+        if not self.split:
+            return True
+        self.relabel()
+        return not self.get_roots(start).isdisjoint(self.get_roots(end))
+
+
+def label_components(grid, diagonal=False):
+    # For every free cell the smallest cell of its region, walls label themselves.
+    # Each round hooks the larger label of every pair of neighbours that disagree
+    # onto the smaller one, then follows the labels to their roots.
+    cols = grid.cols
+    cells = np.arange(grid.size, dtype=np.int32)
+    free = grid.walls == 0
+    labels = cells.copy()
+    # DOWN and RIGHT, with diagonal moves also down left and down right
+    directions = ((0, cols), (2, 1)) + (((4, cols - 1), (6, cols + 1)) if diagonal else ())
+    pairs = []
+    for bit, offset in directions:
+        first = np.flatnonzero(free & (grid.masks >> bit & 1).astype(bool)).astype(np.int32)
+        pairs.append((first, first + offset))
+    changed = True
+    while changed:
+        changed = False
+        for first, second in pairs:
+            first_labels = labels[first]
+            second_labels = labels[second]
+            differ = first_labels != second_labels
+            if differ.any():
+                changed = True
+                np.minimum.at(labels, np.maximum(first_labels, second_labels)[differ],
+                              np.minimum(first_labels, second_labels)[differ])
+        roots = labels[labels]
+        while (roots != labels).any():
+            labels = roots
+            roots = labels[labels]
+    return labels
+
+
+def is_connected(grid, start, end, diagonal=False):
+    # Asked by the searches before they start, True when the grid has no index
+    components = grid.components.get(diagonal)
+    return components is None or components.connected(start, end)
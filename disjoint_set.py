@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class DisjointSet:
+    # Union-find over the integers 0..size-1 kept in flat arrays, with path halving
+    # and union by rank
+    def __init__(self, size):
+        self.parent_array = np.arange(size, dtype=np.int32)
+        self.rank_array = np.zeros(size, dtype=np.uint8)
+        self.parent = self.parent_array.data
+        self.rank = self.rank_array.data
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        # Returns False when a and b were already in the same set
+        a = self.find(a)
+        b = self.find(b)
+        if a == b:
+            return False
+        rank = self.rank
+        if rank[a] < rank[b]:
+            a, b = b, a
+        self.parent[b] = a
+        if rank[a] == rank[b]:
+            rank[a] += 1
+        return True
+
+    def flatten(self):
+        # Points every item straight at its root and returns the parent array
+        parent = self.parent_array
+        grandparent = parent[parent]
+        while (grandparent != parent).any():
+            parent[:] = grandparent
+            grandparent = parent[parent]
+        return parent
+
+    def connected(self, a, b):
+        return self.find(a) == self.find(b)
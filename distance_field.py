@@ -0,0 +1,131 @@
+import numpy as np
+from grid_engine import ORTHOGONAL, DIAGONAL, DIAGONAL_LENGTH
+
+
+def distance_field(grid, sources, diagonal=False, targets=None, nearest=False):
+    # Multi-source Dijkstra over the whole grid, relaxed one frontier at a time with
+    # NumPy: every round steps out of the cells that got cheaper in the last one.
+    # Costs are the ones a_star and dijkstra minimise, grid.costs of every cell
+    # stepped onto with diagonal steps DIAGONAL_LENGTH times dearer. Returns the cost
+    # from the closest source for every cell, np.inf where no source reaches. Sources
+    # and targets may be walls: a wall source is left through its free neighbours
+    # and a wall target is entered from them, but no search goes through a wall.
+    # With targets the search stops as soon as none of them can get any cheaper.
+    # With nearest=True the index of the closest source is returned too.
+    cols = grid.cols
+    offsets = np.array([d_row * cols + d_col for d_row, d_col in ORTHOGONAL + DIAGONAL])
+    lengths = np.array([1.0] * len(ORTHOGONAL) + [DIAGONAL_LENGTH] * len(DIAGONAL))
+    n_directions = 8 if diagonal else 4
+    costs = grid.costs
+    min_cost = float(costs.min())
+    sources = np.array([grid.index(source) for source in sources], dtype=np.intp)
+    dist = np.full(grid.size, np.inf)
+    label = np.full(grid.size, -1, dtype=np.int32) if nearest else None
+
+    frontier, first = np.unique(sources, return_index=True)
+    dist[frontier] = 0
+    if nearest:
+        label[frontier] = first
+    if targets is not None:
+        targets = np.array([grid.index(target) for target in targets], dtype=np.intp)
+        target_neighbors = get_neighbor_cells(grid, targets, n_directions)
+    # Where each cell last showed up in reached, to drop its repeats
+    last_seen = np.empty(grid.size, dtype=np.intp)
+
+    while len(frontier):
+        # Whatever gets cheaper from now on goes through a frontier cell and at least
+        # one more step
+        if targets is not None and is_resolved(grid, dist, targets, target_neighbors, lengths,
+                                               dist[frontier].min() + min_cost):
+            break
+        masks = grid.masks[frontier]
+        reached = []
+        through = []
+        reached_from = []
+        for bit in range(n_directions):
+            step = frontier[(masks >> bit & 1).astype(bool)]
+            cells = step + offsets[bit]
+            reached.append(cells)
+            through.append(dist[step] + lengths[bit] * costs[cells])
+            if nearest:
+                reached_from.append(label[step])
+        reached = np.concatenate(reached)
+        through = np.concatenate(through)
+        better = through < dist[reached]
+        reached = reached[better]
+        through = through[better]
+        np.minimum.at(dist, reached, through)
+        if nearest:
+            won = through == dist[reached]
+            label[reached[won]] = np.concatenate(reached_from)[better][won]
+        order = np.arange(len(reached))
+        last_seen[reached] = order
+        frontier = reached[last_seen[reached] == order]
+
+    if targets is not None:
+        fill_wall_targets(grid, dist, label, targets, target_neighbors, lengths)
+    return (dist, label) if nearest else dist
+
+
+def get_neighbor_cells(grid, cells, n_directions):
+    # (len(cells), n_directions) array of neighbouring cells, -1 off the grid
+    rows, cols = np.divmod(cells, grid.cols)
+    neighbors = np.full((len(cells), n_directions), -1, dtype=np.intp)
+    for direction, (d_row, d_col) in enumerate((ORTHOGONAL + DIAGONAL)[:n_directions]):
+        n_rows = rows + d_row
+        n_cols = cols + d_col
+        inside = (n_rows >= 0) & (n_rows < grid.rows) & (n_cols >= 0) & (n_cols < grid.cols)
+        neighbors[inside, direction] = n_rows[inside] * grid.cols + n_cols[inside]
+    return neighbors
+
+
+def get_entry_costs(grid, dist, targets, target_neighbors, lengths):
+    # (len(targets), n_directions) costs of stepping into each target from each of
+    # its neighbours, np.inf where there is none or it isn't reached
+    n_directions = target_neighbors.shape[1]
+    near = np.where(target_neighbors >= 0, dist[target_neighbors], np.inf)
+    return near + lengths[:n_directions] * grid.costs[targets][:, None]
+
+
+def is_resolved(grid, dist, targets, target_neighbors, lengths, bound):
+    # A free target is settled once its cost is within bound, a wall target once the
+    # cheapest way in from a neighbour is
+    cost = dist[targets]
+    walls = (grid.walls[targets] != 0) & (cost == np.inf)
+    if walls.any():
+        cost = cost.copy()
+        cost[walls] = get_entry_costs(grid, dist, targets[walls], target_neighbors[walls], lengths).min(axis=1)
+    return bool((cost <= bound).all())
+
+
+def fill_wall_targets(grid, dist, label, targets, target_neighbors, lengths):
+    # Only sources are walls with a cost, so any reached neighbour can step in. All
+    # targets are looked up before any is filled, a wall target is no way in.
+    walls = (grid.walls[targets] != 0) & (dist[targets] == np.inf)
+    targets = targets[walls]
+    target_neighbors = target_neighbors[walls]
+    entry = get_entry_costs(grid, dist, targets, target_neighbors, lengths)
+    closest = np.argmin(entry, axis=1)
+    cost = entry[np.arange(len(targets)), closest]
+    reached = cost < np.inf
+    dist[targets[reached]] = cost[reached]
+    if label is not None:
+        label[targets[reached]] = label[target_neighbors[reached, closest[reached]]]
+
+
+def distance_matrix(grid, locations, diagonal=False):
+    # Grid costs between every pair of locations, np.inf where one can't reach the
+    # other. One Dijkstra per location, each stopping once every location is settled.
+    # Stepping onto a cell is what costs, so a leg and its way back can differ. The
+    # matrix holds the mean of both ways to stay symmetric for the ants. With
+    # 4-connected moves the two ways differ by costs[b] - costs[a], so every round
+    # trip through the locations keeps its exact cost. With diagonal moves a step
+    # costs sqrt(2) times the cell it lands on, the difference depends on the route
+    # and round trips are only estimated. Without a cost layer both ways are equal.
+    n_locs = len(locations)
+    cells = np.array([grid.index(location) for location in locations], dtype=np.intp)
+    matrix = np.full((n_locs, n_locs), np.inf)
+    for i, location in enumerate(locations):
+        dist = distance_field(grid, [location], diagonal, targets=locations)
+        matrix[i] = dist[cells]
+    return (matrix + matrix.T) / 2
@@ -0,0 +1,163 @@
+import math
+import numpy as np
+from grid_engine import CLEAR, CLOSED, PATH, ORTHOGONAL_BITS, ALL_BITS
+from algorithms import manhattan_distance, octile_distance
+from observers import as_observer
+from open_set import OpenSet
+
+INF = math.inf
+
+
+class DStarLite:
+    # D* Lite: searches backwards from end and keeps its g/rhs values between calls,
+    # so after walls change or the start moves only the affected part of the search
+    # tree is repaired. Change the walls with grid.set_wall or the costs with
+    # grid.set_cost, then tell the planner which cells changed with update_cells
+    # before calling compute_path again. Steps cost what they cost a_star.
+    def __init__(self, grid, start, end, diagonal=False):
+        self.grid = grid
+        self.diagonal = diagonal
+        self.bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+        self.distance = octile_distance if diagonal else manhattan_distance
+        self.min_cost = float(grid.costs.min())
+        self.start = grid.index(start)
+        self.end = grid.index(end)
+        self.last_start = self.start
+        self.km = 0
+        self.g_array = np.full(grid.size, INF)
+        self.rhs_array = np.full(grid.size, INF)
+        self.g = self.g_array.data
+        self.rhs = self.rhs_array.data
+        self.open_set = OpenSet()
+        self.expanded = 0
+        if not grid.walls[self.end]:
+            self.rhs[self.end] = 0
+            self.open_set.update(self.end, self.calculate_key(self.end))
+
+    def heuristic(self, cell):
+        cols = self.grid.cols
+        return self.min_cost * self.distance(divmod(cell, cols), divmod(self.start, cols))
+
+    def calculate_key(self, cell):
+        best = min(self.g[cell], self.rhs[cell])
+        return (best + self.heuristic(cell) + self.km, best)
+
+    def update_vertex(self, cell):
+        g = self.g
+        rhs = self.rhs
+        if cell != self.end:
+            if self.grid.walls[cell]:
+                rhs[cell] = INF
+            else:
+                costs = self.grid.costs.data
+                moves = self.grid.moves[self.grid.masks[cell] & self.bits]
+                rhs[cell] = min([g[cell + delta] + length * costs[cell + delta] for delta, length in moves],
+                                default=INF)
+        elif self.grid.walls[cell]:
+            rhs[cell] = INF
+        else:
+            rhs[cell] = 0
+        self.update_queue(cell)
+
+    def update_queue(self, cell):
+        if self.g[cell] != self.rhs[cell]:
+            self.open_set.update(cell, self.calculate_key(cell))
+        else:
+            self.open_set.discard(cell)
+
+    def compute_path(self, observer=None):
+        # Returns the path from start to end as (row, col) cells, or None
+        observer = as_observer(observer)
+        watch = observer.watching
+        grid = self.grid
+        masks = grid.masks.data
+        deltas = grid.deltas
+        moves = grid.moves
+        costs = grid.costs.data
+        bits = self.bits
+        state = grid.state.data
+        g = self.g
+        rhs = self.rhs
+        open_set = self.open_set
+        start = self.start
+        if watch:
+            grid.state.fill(CLEAR)
+
+        while open_set and (open_set.peek() < self.calculate_key(start) or rhs[start] != g[start]):
+            old_key = open_set.peek()
+            current = open_set.pop()
+            new_key = self.calculate_key(current)
+            if old_key < new_key:
+                open_set.update(current, new_key)
+                continue
+            self.expanded += 1
+            if g[current] > rhs[current]:
+                # A lower g can only lower the neighbours' rhs, no need to rescan theirs
+                g[current] = rhs[current]
+                cost = costs[current]
+                for delta, length in moves[masks[current] & bits]:
+                    neighbor = current + delta
+                    through = g[current] + length * cost
+                    if through < rhs[neighbor]:
+                        rhs[neighbor] = through
+                        self.update_queue(neighbor)
+            else:
+                g[current] = INF
+                self.update_vertex(current)
+                for delta in deltas[masks[current] & bits]:
+                    self.update_vertex(current + delta)
+            if watch:
+                state[current] = CLOSED
+                observer.mark(current, CLOSED)
+                observer.step()
+
+        path = self.get_path()
+        if watch and path is not None:
+            for row, col in path:
+                cell = row * grid.cols + col
+                state[cell] = PATH
+                observer.mark(cell, PATH)
+        observer.finish()
+        return path
+
+    def get_path(self):
+        # Follow the cheapest successor from start, ties go to the lower cell
+        grid = self.grid
+        masks = grid.masks.data
+        moves = grid.moves
+        costs = grid.costs.data
+        g = self.g
+        current = self.start
+        if g[current] == INF or grid.walls[current]:
+            return None
+        cells = [current]
+        while current != self.end:
+            through, current = min((g[current + delta] + length * costs[current + delta], current + delta)
+                                   for delta, length in moves[masks[current] & self.bits])
+            cells.append(current)
+        cols = grid.cols
+        return [divmod(cell, cols) for cell in cells]
+
+    def move_start(self, start):
+        # The robot moved: keys already queued stay valid by raising km instead
+        self.start = self.grid.index(start)
+        self.km += self.heuristic(self.last_start)
+        self.last_start = self.start
+
+    def update_cells(self, positions):
+        # Cells whose wall flag or cost changed since the last compute_path
+        grid = self.grid
+        masks = grid.masks.data
+        deltas = grid.deltas
+        min_cost = float(grid.costs.min())
+        if min_cost < self.min_cost:
+            # The heuristic would overestimate with the old cheapest cell, so every
+            # queued key is worked out again
+            self.min_cost = min_cost
+            for cell in list(self.open_set.best):
+                self.open_set.update(cell, self.calculate_key(cell))
+        for pos in positions:
+            cell = grid.index(pos)
+            self.update_vertex(cell)
+            for delta in deltas[masks[cell] & self.bits]:
+                self.update_vertex(cell + delta)
@@ -0,0 +1,134 @@
+import math
+import numpy as np
+
+CLEAR = 0
+OPEN = 1
+CLOSED = 2
+PATH = 3
+
+# DOWN, UP, RIGHT, LEFT, then the diagonals. Bit k of a cell's mask is set when
+# the move in direction k stays on the grid and lands on a free cell.
+ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL = ((1, -1), (-1, -1), (1, 1), (-1, 1))
+ORTHOGONAL_BITS = 0x0F
+ALL_BITS = 0xFF
+DIAGONAL_LENGTH = math.sqrt(2)
+
+
+class Grid:
+    def __init__(self, rows, cols=None):
+        if cols is None:
+            cols = rows
+        self.rows = rows
+        self.cols = cols
+        self.size = rows * cols
+        self.walls = np.zeros(self.size, dtype=np.uint8)
+        self.state = np.zeros(self.size, dtype=np.uint8)
+        # Cells the last search expanded
+        self.expanded = 0
+        self.parent = np.full(self.size, -1, dtype=np.int32)
+        self.masks = np.zeros(self.size, dtype=np.uint8)
+        # Cost of stepping onto each cell, diagonal steps cost DIAGONAL_LENGTH times more
+        self.costs = np.ones(self.size, dtype=np.float32)
+        # version goes up with every wall change, cleared_version is the version of
+        # the last change that removed walls
+        self.version = 0
+        self.cleared_version = 0
+        # ComponentIndex of each connectivity, keyed by diagonal, kept up to date here
+        self.components = {}
+        # Flat index offsets of the free neighbours for every possible mask
+        offsets = [d_row * cols + d_col for d_row, d_col in ORTHOGONAL + DIAGONAL]
+        self.deltas = [tuple(offset for bit, offset in enumerate(offsets) if mask >> bit & 1)
+                       for mask in range(256)]
+        # The same with the length of each step, for the searches that weigh steps
+        lengths = [1.0] * len(ORTHOGONAL) + [DIAGONAL_LENGTH] * len(DIAGONAL)
+        self.moves = [tuple((offset, lengths[bit]) for bit, offset in enumerate(offsets) if mask >> bit & 1)
+                      for mask in range(256)]
+        self.update_masks()
+
+    @classmethod
+    def from_walls(cls, walls, costs=None):
+        walls = np.asarray(walls)
+        grid = cls(walls.shape[0], walls.shape[1])
+        grid.walls[:] = walls.ravel() != 0
+        if costs is not None:
+            grid.costs[:] = np.asarray(costs).ravel()
+        grid.update_masks()
+        return grid
+
+    def update_masks(self):
+        rows = self.rows
+        cols = self.cols
+        free = np.pad(self.walls_2d() == 0, 1).view(np.uint8)
+        masks = np.zeros((rows, cols), dtype=np.uint8)
+        for bit, (d_row, d_col) in enumerate(ORTHOGONAL + DIAGONAL):
+            masks |= free[1 + d_row:1 + d_row + rows, 1 + d_col:1 + d_col + cols] << bit
+        self.masks[:] = masks.ravel()
+        # The walls may have changed in any way
+        self.version += 1
+        self.cleared_version = self.version
+        for components in self.components.values():
+            components.invalidate()
+
+    def index(self, pos):
+        row, col = pos
+        return row * self.cols + col
+
+    def pos(self, index):
+        return divmod(int(index), self.cols)
+
+    def in_bounds(self, pos):
+        row, col = pos
+        return 0 <= row < self.rows and 0 <= col < self.cols
+
+    def is_wall(self, pos):
+        return bool(self.walls[self.index(pos)])
+
+    def set_wall(self, pos, wall=True):
+        index = self.index(pos)
+        if bool(self.walls[index]) == wall:
+            return
+        self.walls[index] = wall
+        self.version += 1
+        if not wall:
+            self.cleared_version = self.version
+        # Only the neighbours that can step onto this cell change
+        row, col = pos
+        for bit, (d_row, d_col) in enumerate(ORTHOGONAL + DIAGONAL):
+            n_row = row - d_row
+            n_col = col - d_col
+            if 0 <= n_row < self.rows and 0 <= n_col < self.cols:
+                neighbor = n_row * self.cols + n_col
+                if wall:
+                    self.masks[neighbor] &= ~(1 << bit) & 0xFF
+                else:
+                    self.masks[neighbor] |= 1 << bit
+        for components in self.components.values():
+            components.set_wall(index, wall)
+
+    def set_cost(self, pos, cost):
+        index = self.index(pos)
+        if self.costs[index] == cost:
+            return
+        self.costs[index] = cost
+        # A cheaper or dearer cell can change which path is shortest anywhere
+        self.version += 1
+        self.cleared_version = self.version
+
+    def costs_2d(self):
+        return self.costs.reshape(self.rows, self.cols)
+
+    def walls_2d(self):
+        return self.walls.reshape(self.rows, self.cols)
+
+    def state_2d(self):
+        return self.state.reshape(self.rows, self.cols)
+
+    def reset_search(self):
+        self.state.fill(CLEAR)
+        self.parent.fill(-1)
+        self.expanded = 0
+
+    def neighbors(self, index, diagonal=False):
+        bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+        return [index + delta for delta in self.deltas[self.masks[index] & bits]]
@@ -0,0 +1,106 @@
+import os
+import glob
+import pickle
+import numpy as np
+from grid_engine import Grid
+
+# .grid files: a fixed size little-endian header, then the walls packed eight
+# cells per byte in row-major order. Missing start/end cells are stored as -1.
+GRID_MAGIC = b"GRID"
+GRID_VERSION = 1
+GRID_HEADER = np.dtype([("magic", "S4"), ("version", "<u2"), ("reserved", "<u2"),
+                        ("rows", "<u4"), ("cols", "<u4"),
+                        ("start", "<i4", 2), ("end", "<i4", 2)])
+
+# Node colors used by path-search-algorithms.py when the grids were pickled
+BARRIER_COLOR = (249, 255, 203)
+START_COLOR = (255, 180, 71)
+END_COLOR = (130, 179, 255)
+
+
+class PickledNode:
+    pass
+
+
+class NodeUnpickler(pickle.Unpickler):
+    # The pickles refer to __main__.Node, load them without the pygame app
+    def find_class(self, module, name):
+        if name == "Node":
+            return PickledNode
+        return super().find_class(module, name)
+
+
+def load_pickled_grid(file_name):
+    with open(file_name, 'rb') as pickle_file:
+        nodes = NodeUnpickler(pickle_file).load()
+    grid = Grid(len(nodes), len(nodes[0]))
+    start = None
+    end = None
+    for row in nodes:
+        for node in row:
+            color = tuple(node.color)
+            if color == BARRIER_COLOR:
+                grid.set_wall((node.row, node.col))
+            elif color == START_COLOR:
+                start = (node.row, node.col)
+            elif color == END_COLOR:
+                end = (node.row, node.col)
+    return grid, start, end
+
+
+def save_grid(file_name, grid, start=None, end=None):
+    header = np.zeros(1, dtype=GRID_HEADER)
+    header["magic"] = GRID_MAGIC
+    header["version"] = GRID_VERSION
+    header["rows"] = grid.rows
+    header["cols"] = grid.cols
+    header["start"] = start if start is not None else (-1, -1)
+    header["end"] = end if end is not None else (-1, -1)
+    with open(file_name, 'wb') as grid_file:
+        header.tofile(grid_file)
+        np.packbits(grid.walls != 0).tofile(grid_file)
+
+
+def read_grid_header(file_name):
+    header = np.fromfile(file_name, dtype=GRID_HEADER, count=1)
+    if len(header) == 0 or header["magic"][0] != GRID_MAGIC:
+        raise ValueError(f"{file_name} is not a .grid file")
+    if header["version"][0] != GRID_VERSION:
+        raise ValueError(f"{file_name} has unsupported .grid version {header['version'][0]}")
+    header = header[0]
+    start = tuple(int(value) for value in header["start"])
+    end = tuple(int(value) for value in header["end"])
+    return int(header["rows"]), int(header["cols"]), \
+        start if start[0] >= 0 else None, end if end[0] >= 0 else None
+
+
+def load_packed_walls(file_name):
+    # Memory maps the packed walls, so nothing but the header is read up front
+    rows, cols, start, end = read_grid_header(file_name)
+    packed = np.memmap(file_name, dtype=np.uint8, mode='r', offset=GRID_HEADER.itemsize,
+                       shape=((rows * cols + 7) // 8,))
+    return packed, rows, cols, start, end
+
+
+def load_grid(file_name):
+    packed, rows, cols, start, end = load_packed_walls(file_name)
+    grid = Grid(rows, cols)
+    grid.walls[:] = np.unpackbits(packed, count=rows * cols)
+    grid.update_masks()
+    return grid, start, end
+
+
+def convert_pickled_grids(directory="Grids"):
+    # Writes example_grid_N.grid next to every example_grid_N.pkl
+    converted = []
+    for pickle_name in sorted(glob.glob(os.path.join(directory, "*.pkl"))):
+        grid, start, end = load_pickled_grid(pickle_name)
+        file_name = os.path.splitext(pickle_name)[0] + ".grid"
+        save_grid(file_name, grid, start, end)
+        converted.append(file_name)
+    return converted
+
+
+if __name__ == "__main__":
+    for file_name in convert_pickled_grids():
+        print(file_name)
@@ -0,0 +1,337 @@
+import math
+import numpy as np
+from grid_engine import ORTHOGONAL, DIAGONAL, ORTHOGONAL_BITS, ALL_BITS, DIAGONAL_LENGTH
+from algorithms import manhattan_distance, octile_distance
+from open_set import OpenSet
+
+INF = math.inf
+# Entrances at least this wide get a transition at both ends instead of one in the middle
+LONG_ENTRANCE = 6
+
+
+class HPAStar:
+    # Hierarchical path finding (HPA*). The grid is cut into square clusters, every
+    # free stretch along a border between two clusters gets one or two transitions,
+    # and the cost between the transition cells of each cluster is precomputed. A
+    # query searches that small graph and then fills in the steps inside each cluster.
+    # Paths are near optimal: they cross borders only at the transitions. After walls
+    # or costs change, pass the changed cells to update_cells, which only redoes the
+    # clusters around them.
+    def __init__(self, grid, cluster_size=32, diagonal=False):
+        self.grid = grid
+        self.cluster_size = cluster_size
+        self.diagonal = diagonal
+        self.bits = ALL_BITS if diagonal else ORTHOGONAL_BITS
+        self.cluster_rows = -(-grid.rows // cluster_size)
+        self.cluster_cols = -(-grid.cols // cluster_size)
+        self.n_clusters = self.cluster_rows * self.cluster_cols
+        self.inside = self.get_inside_masks()
+        # transitions[(a, b)] lists the (cell in a, cell in b, step length) crossings
+        # of the border between clusters a < b, links[u][v] is the cost of crossing.
+        # nodes[cluster] are the transition cells of a cluster and edges[u][v] the
+        # cost from u to v without leaving their cluster.
+        self.transitions = {}
+        self.links = {}
+        self.nodes = [set() for cluster in range(self.n_clusters)]
+        self.edges = {}
+        self.expanded = 0
+        self.build()
+
+    def get_inside_masks(self):
+        # Neighbour bits of every cell that stay within the cell's cluster
+        grid = self.grid
+        size = self.cluster_size
+        rows = np.arange(grid.rows)
+        cols = np.arange(grid.cols)
+        inside = np.zeros((grid.rows, grid.cols), dtype=np.uint8)
+        for bit, (d_row, d_col) in enumerate(ORTHOGONAL + DIAGONAL):
+            same_row = ((rows + d_row) // size == rows // size) & (rows + d_row < grid.rows)
+            same_col = ((cols + d_col) // size == cols // size) & (cols + d_col < grid.cols)
+            inside |= np.outer(same_row, same_col).view(np.uint8) << bit
+        return inside.ravel()
+
+    def cluster_of(self, cell):
+        row, col = divmod(cell, self.grid.cols)
+        return row // self.cluster_size * self.cluster_cols + col // self.cluster_size
+
+    def get_bounds(self, cluster):
+        # First and one past last row and column of a cluster
+        size = self.cluster_size
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        return (cluster_row * size, min(cluster_row * size + size, self.grid.rows),
+                cluster_col * size, min(cluster_col * size + size, self.grid.cols))
+
+    def get_neighbor_clusters(self, cluster, on_top=True, on_bottom=True, on_left=True, on_right=True):
+        # Clusters sharing a border with cluster, the corner ones only with diagonal moves
+        cluster_row, cluster_col = divmod(cluster, self.cluster_cols)
+        neighbors = []
+        for d_row, d_col in ORTHOGONAL + (DIAGONAL if self.diagonal else ()):
+            if (d_row == -1 and not on_top) or (d_row == 1 and not on_bottom):
+                continue
+            if (d_col == -1 and not on_left) or (d_col == 1 and not on_right):
+                continue
+            n_row = cluster_row + d_row
+            n_col = cluster_col + d_col
+            if 0 <= n_row < self.cluster_rows and 0 <= n_col < self.cluster_cols:
+                neighbors.append(n_row * self.cluster_cols + n_col)
+        return neighbors
+
+    def build(self):
+        for cluster in range(self.n_clusters):
+            for neighbor in self.get_neighbor_clusters(cluster):
+                if neighbor > cluster:
+                    self.set_border(cluster, neighbor)
+        for cluster in range(self.n_clusters):
+            self.nodes[cluster] = self.get_nodes(cluster)
+        self.connect_all()
+
+    def get_border_transitions(self, a, b):
+        grid = self.grid
+        cols = grid.cols
+        a_row0, a_row1, a_col0, a_col1 = self.get_bounds(a)
+        b_row0, b_row1, b_col0, b_col1 = self.get_bounds(b)
+        if b_row0 == a_row0:
+            # b is right of a
+            rows = np.arange(a_row0, a_row1)
+            return self.get_line_transitions(rows * cols + a_col1 - 1, rows * cols + b_col0)
+        if b_col0 == a_col0:
+            # b is below a
+            border_cols = np.arange(a_col0, a_col1)
+            return self.get_line_transitions((a_row1 - 1) * cols + border_cols, b_row0 * cols + border_cols)
+        # Corners: b is down right or down left of a
+        if b_col0 > a_col0:
+            cell_a, cell_b = (a_row1 - 1) * cols + a_col1 - 1, b_row0 * cols + b_col0
+        else:
+            cell_a, cell_b = (a_row1 - 1) * cols + a_col0, b_row0 * cols + b_col1 - 1
+        if grid.walls[cell_a] or grid.walls[cell_b]:
+            return []
+        return [(cell_a, cell_b, DIAGONAL_LENGTH)]
+
+    def get_line_transitions(self, side_a, side_b):
+        # side_a and side_b are the facing cells of the two clusters along a border
+        free_a = self.grid.walls[side_a] == 0
+        free_b = self.grid.walls[side_b] == 0
+        straight = free_a & free_b
+        ends = np.flatnonzero(np.diff(np.concatenate(([0], straight.view(np.int8), [0]))))
+        picks = []
+        for begin, end in zip(ends[::2], ends[1::2]):
+            picks += [begin, end - 1] if end - begin >= LONG_ENTRANCE else [(begin + end - 1) // 2]
+        transitions = [(int(side_a[i]), int(side_b[i]), 1.0) for i in picks]
+        if self.diagonal:
+            # Crossings that only exist diagonally, next to no straight one
+            alone = ~straight[:-1] & ~straight[1:]
+            for i in np.flatnonzero(alone & free_a[:-1] & free_b[1:]):
+                transitions.append((int(side_a[i]), int(side_b[i + 1]), DIAGONAL_LENGTH))
+            for i in np.flatnonzero(alone & free_a[1:] & free_b[:-1]):
+                transitions.append((int(side_a[i + 1]), int(side_b[i]), DIAGONAL_LENGTH))
+        return transitions
+
+    def set_border(self, a, b):
+        links = self.links
+        costs = self.grid.costs
+        for u, v, length in self.transitions.get((a, b), ()):
+            for cell, other in ((u, v), (v, u)):
+                del links[cell][other]
+                if not links[cell]:
+                    del links[cell]
+        transitions = self.get_border_transitions(a, b)
+        self.transitions[(a, b)] = transitions
+        for u, v, length in transitions:
+            links.setdefault(u, {})[v] = length * float(costs[v])
+            links.setdefault(v, {})[u] = length * float(costs[u])
+
+    def get_nodes(self, cluster):
+        nodes = set()
+        for neighbor in self.get_neighbor_clusters(cluster):
+            for u, v, length in self.transitions[(min(cluster, neighbor), max(cluster, neighbor))]:
+                nodes.add(u if cluster < neighbor else v)
+        return nodes
+
+    def connect_all(self):
+        # The k-th node of every cluster is searched from at once, clusters don't mix
+        node_cells = []
+        node_clusters = []
+        slots = []
+        for cluster, nodes in enumerate(self.nodes):
+            node_cells += sorted(nodes)
+            node_clusters += [cluster] * len(nodes)
+            slots += range(len(nodes))
+        node_cells = np.array(node_cells, dtype=np.intp)
+        node_clusters = np.array(node_clusters, dtype=np.intp)
+        slots = np.array(slots, dtype=np.intp)
+        self.edges = {int(cell): {} for cell in node_cells}
+        for slot in range(slots.max() + 1 if len(slots) else 0):
+            sources = node_cells[slots == slot]
+            dist = self.get_cluster_fields(sources)
+            source_of = np.full(self.n_clusters, -1, dtype=np.intp)
+            source_of[node_clusters[slots == slot]] = sources
+            from_cells = source_of[node_clusters]
+            costs = dist[node_cells]
+            keep = (from_cells >= 0) & (from_cells != node_cells) & np.isfinite(costs)
+            edges = self.edges
+            for u, v, cost in zip(from_cells[keep].tolist(), node_cells[keep].tolist(), costs[keep].tolist()):
+                edges[u][v] = cost
+
+    def get_cluster_fields(self, sources):
+        # Costs from the sources to every cell of their clusters, inf elsewhere. The
+        # frontier of cells that got cheaper is relaxed with NumPy until none does.
+        grid = self.grid
+        cols = grid.cols
+        offsets = np.array([d_row * cols + d_col for d_row, d_col in ORTHOGONAL + DIAGONAL])
+        lengths = np.array([1.0] * len(ORTHOGONAL) + [DIAGONAL_LENGTH] * len(DIAGONAL))
+        n_directions = 8 if self.diagonal else 4
+        dist = np.full(grid.size, INF)
+        dist[sources] = 0
+        # Where each cell last showed up in reached, to drop its repeats
+        last_seen = np.empty(grid.size, dtype=np.intp)
+        frontier = sources
+        while len(frontier):
+            masks = grid.masks[frontier] & self.inside[frontier]
+            reached = []
+            through = []
+            for bit in range(n_directions):
+                step = frontier[(masks >> bit & 1).astype(bool)]
+                cells = step + offsets[bit]
+                reached.append(cells)
+                through.append(dist[step] + lengths[bit] * grid.costs[cells])
+            reached = np.concatenate(reached)
+            through = np.concatenate(through)
+            better = through < dist[reached]
+            reached = reached[better]
+            np.minimum.at(dist, reached, through[better])
+            order = np.arange(len(reached))
+            last_seen[reached] = order
+            frontier = reached[last_seen[reached] == order]
+        return dist
+
+    def connect_cluster(self, cluster, old_nodes=()):
+        edges = self.edges
+        for cell in old_nodes:
+            edges.pop(cell, None)
+        nodes = self.nodes[cluster]
+        for u in nodes:
+            dist, parent = self.search_cluster(u)
+            edges[u] = {v: dist[v] for v in nodes if v != u and v in dist}
+
+    def search_cluster(self, source, goal=None, reverse=False):
+        # Dijkstra that never leaves the cluster of source. Returns the cost from source
+        # to every cell reached, or with reverse=True from every cell to source, and
+        # the parents. Stops early once goal is taken off the heap.
+        grid = self.grid
+        masks = grid.masks.data
+        inside = self.inside.data
+        moves = grid.moves
+        costs = grid.costs.data
+        bits = self.bits
+        dist = {source: 0.0}
+        parent = {source: None}
+        open_set = OpenSet()
+        open_set.push(source, 0.0)
+        while open_set:
+            current = open_set.pop()
+            if current == goal:
+                break
+            for delta, length in moves[masks[current] & inside[current] & bits]:
+                neighbor = current + delta
+                through = dist[current] + length * costs[current if reverse else neighbor]
+                if through < dist.get(neighbor, INF):
+                    dist[neighbor] = through
+                    parent[neighbor] = current
+                    open_set.push(neighbor, through)
+        return dist, parent
+
+    def update_cells(self, positions):
+        # Cells whose wall flag or cost changed since the last call. Borders the cells
+        # lie on get new transitions, clusters get new edges if a cell is inside them
+        # or their transitions moved.
+        size = self.cluster_size
+        changed = set()
+        borders = set()
+        for row, col in positions:
+            cluster = self.cluster_of(row * self.grid.cols + col)
+            changed.add(cluster)
+            for neighbor in self.get_neighbor_clusters(cluster, row % size == 0, row % size == size - 1,
+                                                       col % size == 0, col % size == size - 1):
+                borders.add((min(cluster, neighbor), max(cluster, neighbor)))
+        touched = set(changed)
+        for a, b in borders:
+            self.set_border(a, b)
+            touched.update((a, b))
+        for cluster in touched:
+            nodes = self.get_nodes(cluster)
+            if cluster in changed or nodes != self.nodes[cluster]:
+                old_nodes = self.nodes[cluster]
+                self.nodes[cluster] = nodes
+                self.connect_cluster(cluster, old_nodes)
+
+    def find_abstract_path(self, start, end):
+        # Cheapest route over the transitions as (cost, cells), the cells being start,
+        # the transitions passed and end. None when end can't be reached.
+        grid = self.grid
+        start = grid.index(start)
+        end = grid.index(end)
+        if start == end:
+            return 0.0, [start]
+        if grid.walls[end]:
+            return None
+        start_cluster = self.cluster_of(start)
+        end_cluster = self.cluster_of(end)
+        from_start, parent = self.search_cluster(start)
+        to_end, parent = self.search_cluster(end, reverse=True)
+        start_edges = {v: from_start[v] for v in self.nodes[start_cluster] if v in from_start and v != start}
+        if start_cluster == end_cluster and end in from_start:
+            start_edges[end] = from_start[end]
+        end_edges = {u: to_end[u] for u in self.nodes[end_cluster] if u in to_end and u != end}
+
+        heuristic = octile_distance if self.diagonal else manhattan_distance
+        # Nudged up a hair so that among routes of equal cost the one closest to end
+        # goes first, instead of widening over all of them
+        min_cost = float(grid.costs.min()) * (1 + 1e-6)
+        end_pos = grid.pos(end)
+        edges = self.edges
+        links = self.links
+        no_edges = {}
+        g_score = {start: 0.0}
+        parent = {start: None}
+        open_set = OpenSet()
+        open_set.push(start, 0.0)
+        while open_set:
+            current = open_set.pop()
+            self.expanded += 1
+            if current == end:
+                cells = []
+                while current is not None:
+                    cells.append(current)
+                    current = parent[current]
+                return g_score[end], cells[::-1]
+            steps = list((start_edges if current == start else edges.get(current, no_edges)).items())
+            steps += links.get(current, no_edges).items()
+            if current in end_edges:
+                steps.append((end, end_edges[current]))
+            for neighbor, cost in steps:
+                through = g_score[current] + cost
+                if through < g_score.get(neighbor, INF):
+                    g_score[neighbor] = through
+                    parent[neighbor] = current
+                    open_set.push(neighbor, through + min_cost * heuristic(grid.pos(neighbor), end_pos))
+        return None
+
+    def find_path(self, start, end):
+        # The abstract route with the steps inside each cluster filled in, as (row, col)
+        # cells from start to end, or None
+        route = self.find_abstract_path(start, end)
+        if route is None:
+            return None
+        cost, waypoints = route
+        cells = waypoints[:1]
+        for u, v in zip(waypoints, waypoints[1:]):
+            if self.cluster_of(u) != self.cluster_of(v):
+                cells.append(v)
+                continue
+            dist, parent = self.search_cluster(u, goal=v)
+            steps = []
+            while v != u:
+                steps.append(v)
+                v = parent[v]
+            cells += steps[::-1]
+        return [self.grid.pos(cell) for cell in cells]
@@ -0,0 +1,171 @@
+from collections import deque
+import numpy as np
+
+LOCAL_SEARCHES = ("2-opt", "or-opt", "both")
+
+
+def improve_tour(path, distance, neighbors, method="2-opt"):
+    # distance(a, b) gives the edge length, neighbors[a] the nearest locations of a, closest first
+    tour = [int(loc) for loc in path]
+    if len(tour) < 5:
+        return np.array(tour)
+    if method == "2-opt":
+        tour = two_opt(tour, distance, neighbors)
+    elif method == "or-opt":
+        tour = or_opt(tour, distance, neighbors)
+    elif method == "both":
+        tour = two_opt(tour, distance, neighbors)
+        improved = True
+        while improved:
+            length = get_tour_length(tour, distance)
+            tour = two_opt(or_opt(tour, distance, neighbors), distance, neighbors)
+            improved = get_tour_length(tour, distance) < length - 1e-9
+    else:
+        raise ValueError(f"Unknown local search {method!r}, expected one of {LOCAL_SEARCHES}")
+    return np.array(tour)
+
+
+def get_tour_length(tour, distance):
+    return sum(distance(tour[i - 1], tour[i]) for i in range(len(tour)))
+
+
+def reverse_segment(tour, position, i, j):
+    # Reverse the cyclic run of positions i..j, or the complement when that is shorter,
+    # which gives the same cycle
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    for step in range(length // 2):
+        a = (i + step) % n
+        b = (j - step) % n
+        tour[a], tour[b] = tour[b], tour[a]
+        position[tour[a]] = a
+        position[tour[b]] = b
+
+
+def move_segment(tour, position, segment, after, reverse):
+    # Take segment out and put it back right after the location after, reversed if
+    # asked. Only the locations between its old and new place are shifted, from
+    # whichever side holds fewer of them.
+    n = len(tour)
+    length = len(segment)
+    i = position[segment[0]]
+    j = position[after]
+    between_after = (j - i - length) % n + 1
+    between_before = n - length - between_after
+    if between_after <= between_before:
+        for k in range(between_after):
+            loc = tour[(i + length + k) % n]
+            tour[(i + k) % n] = loc
+            position[loc] = (i + k) % n
+        start = i + between_after
+    else:
+        for k in range(between_before):
+            loc = tour[(i - 1 - k) % n]
+            tour[(i + length - 1 - k) % n] = loc
+            position[loc] = (i + length - 1 - k) % n
+        start = j + 1
+    for k, loc in enumerate(segment[::-1] if reverse else segment):
+        tour[(start + k) % n] = loc
+        position[loc] = (start + k) % n
+
+
+def two_opt(tour, distance, neighbors):
+    # Neighbour list 2-opt with don't-look bits: a location is only looked at again
+    # after one of its tour edges changed
+    n = len(tour)
+    position = [0] * n
+    for i, loc in enumerate(tour):
+        position[loc] = i
+    active = deque(tour)
+    queued = [True] * n
+
+    while active:
+        a = active.popleft()
+        queued[a] = False
+        for forward in (True, False):
+            i = position[a]
+            b = tour[(i + 1) % n] if forward else tour[i - 1]
+            d_ab = distance(a, b)
+            move = None
+            for c in neighbors[a]:
+                d_ac = distance(a, c)
+                if d_ac >= d_ab:
+                    break
+                j = position[c]
+                d = tour[(j + 1) % n] if forward else tour[j - 1]
+                if c == a or c == b or d == a:
+                    continue
+                if d_ac + distance(b, d) < d_ab + distance(c, d) - 1e-10:
+                    move = (i, j, b, c, d)
+                    break
+            if move is not None:
+                i, j, b, c, d = move
+                # Replace edges a-b and c-d with a-c and b-d
+                if forward:
+                    reverse_segment(tour, position, (i + 1) % n, j)
+                else:
+                    reverse_segment(tour, position, i, (j - 1) % n)
+                for loc in (a, b, c, d):
+                    if not queued[loc]:
+                        queued[loc] = True
+                        active.append(loc)
+                break
+    return tour
+
+
+def or_opt(tour, distance, neighbors, max_segment=3):
+    # Move runs of up to max_segment locations next to one of the first location's
+    # neighbours, in either orientation, with the same don't-look bits as two_opt
+    n = len(tour)
+    position = [0] * n
+    for i, loc in enumerate(tour):
+        position[loc] = i
+    active = deque(tour)
+    queued = [True] * n
+
+    while active:
+        a = active.popleft()
+        queued[a] = False
+        moved = None
+        for segment_length in range(1, max_segment + 1):
+            i = position[a]
+            segment = [tour[(i + k) % n] for k in range(segment_length)]
+            p = tour[i - 1]
+            q = tour[(i + segment_length) % n]
+            if q == p or q in segment:
+                break
+            first = segment[0]
+            last = segment[-1]
+            removal_gain = distance(p, first) + distance(last, q) - distance(p, q)
+            for c in neighbors[first]:
+                if distance(first, c) >= removal_gain:
+                    break
+                if c in segment:
+                    continue
+                j = position[c]
+                for e, reverse in ((tour[(j + 1) % n], False), (tour[j - 1], True)):
+                    if e in segment:
+                        continue
+                    # Insert between c and e with first next to c
+                    added = distance(c, first) + distance(last, e) - distance(c, e)
+                    if added < removal_gain - 1e-10:
+                        moved = (segment, c, e, reverse)
+                        break
+                if moved:
+                    break
+            if moved:
+                break
+        if moved is None:
+            continue
+
+        segment, c, e, reverse = moved
+        move_segment(tour, position, segment, c if not reverse else e, reverse)
+        for loc in segment + [c, e, p, q]:
+            if not queued[loc]:
+                queued[loc] = True
+                active.append(loc)
+    return tour
+
@@ -0,0 +1,157 @@
+# Reads the .map/.scen benchmark files from https://movingai.com/benchmarks/ and runs
+# their scenarios headlessly.
+# Run from the repository root: python movingai.py maps/*.scen --output results.csv
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+import numpy as np
+from grid_engine import Grid
+from algorithms import path_cost, a_star, dijkstra, breadth_first_search, depth_first_search
+
+# Everything else (@ O T W) is out of bounds, trees or water and counts as a wall
+PASSABLE = b".GS"
+
+SEARCHES = {
+    "a_star": a_star,
+    "dijkstra": dijkstra,
+    "breadth_first_search": breadth_first_search,
+    "depth_first_search": depth_first_search,
+}
+
+RESULT_FIELDS = ("map", "scenario", "bucket", "algorithm", "diagonal", "start", "end",
+                 "found", "path_length", "path_cost", "expansions", "time_ms", "optimal_length")
+
+# x is the column and y the row, optimal_length is the octile distance of the file
+Scenario = namedtuple("Scenario", "bucket map width height start_x start_y goal_x goal_y optimal_length")
+
+
+def load_map(file_name):
+    with open(file_name, 'rb') as map_file:
+        header = {}
+        for line in map_file:
+            line = line.strip()
+            if line == b"map":
+                break
+            key, value = line.split(None, 1)
+            header[key.decode()] = value.decode()
+        rows = int(header["height"])
+        cols = int(header["width"])
+        cells = np.frombuffer(b"".join(line.rstrip(b"\r\n") for line in map_file), dtype=np.uint8)
+    if len(cells) != rows * cols:
+        raise ValueError(f"{file_name} has {len(cells)} cells, expected {rows}x{cols}")
+    walls = ~np.isin(cells, np.frombuffer(PASSABLE, dtype=np.uint8))
+    return Grid.from_walls(walls.reshape(rows, cols))
+
+
+def write_map(file_name, grid):
+    # Walls are written as @, e.g. to save random grids as small test fixtures
+    cells = np.where(grid.walls_2d() != 0, ord("@"), ord(".")).astype(np.uint8)
+    with open(file_name, 'wb') as map_file:
+        map_file.write(f"type octile\nheight {grid.rows}\nwidth {grid.cols}\nmap\n".encode())
+        for row in cells:
+            map_file.write(row.tobytes() + b"\n")
+
+
+def load_scenarios(file_name):
+    scenarios = []
+    with open(file_name) as scen_file:
+        for line in scen_file:
+            fields = line.split("\t")
+            if len(fields) < 9:
+                continue  # "version 1" header
+            scenarios.append(Scenario(int(fields[0]), fields[1], int(fields[2]), int(fields[3]),
+                                      int(fields[4]), int(fields[5]), int(fields[6]), int(fields[7]),
+                                      float(fields[8])))
+    return scenarios
+
+
+def write_scenarios(file_name, map_name, grid, n_scenarios, seed=None):
+    # Random pairs of free cells, the optimal_length column is left at 0
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(grid.walls == 0)
+    with open(file_name, 'w') as scen_file:
+        scen_file.write("version 1\n")
+        for scenario in range(n_scenarios):
+            start_row, start_col = grid.pos(rng.choice(free))
+            goal_row, goal_col = grid.pos(rng.choice(free))
+            scen_file.write(f"0\t{map_name}\t{grid.cols}\t{grid.rows}\t{start_col}\t{start_row}\t"
+                            f"{goal_col}\t{goal_row}\t0\n")
+
+
+def run_scenarios(scen_file_name, algorithms=tuple(SEARCHES), diagonal=False, map_file_name=None):
+    # Yields one result dict per scenario and algorithm. The map is looked up next to
+    # the .scen file unless map_file_name is given.
+    scenarios = load_scenarios(scen_file_name)
+    grids = {}
+    for index, scenario in enumerate(scenarios):
+        map_name = map_file_name or os.path.join(os.path.dirname(scen_file_name),
+                                                 os.path.basename(scenario.map))
+        if map_name not in grids:
+            grids[map_name] = load_map(map_name)
+        grid = grids[map_name]
+        start = (scenario.start_y, scenario.start_x)
+        end = (scenario.goal_y, scenario.goal_x)
+        for algorithm in algorithms:
+            search = SEARCHES[algorithm]
+            start_time = time.perf_counter()
+            path = search(None, grid, start, end, diagonal)
+            elapsed = time.perf_counter() - start_time
+            yield {
+                "map": map_name,
+                "scenario": index,
+                "bucket": scenario.bucket,
+                "algorithm": algorithm,
+                "diagonal": diagonal,
+                "start": start,
+                "end": end,
+                "found": path is not None,
+                "path_length": len(path) - 1 if path is not None else None,
+                "path_cost": path_cost(grid, path) if path is not None else None,
+                "expansions": grid.expanded,
+                "time_ms": elapsed * 1000,
+                "optimal_length": scenario.optimal_length,
+            }
+
+
+def write_results(results, output, output_format):
+    # Rows are written as they come in, so a long batch can be watched with tail -f
+    if output_format == "jsonl":
+        for result in results:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+        return
+    writer = csv.DictWriter(output, RESULT_FIELDS)
+    writer.writeheader()
+    for result in results:
+        writer.writerow(result)
+        output.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenarios", nargs="+", help=".scen files")
+    parser.add_argument("--map", help="map for every scenario instead of the one named in the .scen file")
+    parser.add_argument("--algorithms", nargs="+", choices=tuple(SEARCHES), default=tuple(SEARCHES))
+    parser.add_argument("--diagonal", action="store_true")
+    parser.add_argument("--output", help="CSV or JSONL file, picked by extension (default: CSV to stdout)")
+    parser.add_argument("--format", choices=("csv", "jsonl"))
+    args = parser.parse_args()
+
+    output_format = args.format
+    if output_format is None:
+        output_format = "jsonl" if args.output and args.output.endswith((".jsonl", ".json")) else "csv"
+    results = (result for scen_file_name in args.scenarios
+               for result in run_scenarios(scen_file_name, args.algorithms, args.diagonal, args.map))
+    if args.output is None:
+        write_results(results, sys.stdout, output_format)
+    else:
+        with open(args.output, 'w', newline='') as output:
+            write_results(results, output, output_format)
+
+
+if __name__ == "__main__":
+    main()
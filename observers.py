@@ -0,0 +1,51 @@
+import time
+
+
+class SearchObserver:
+    # Does nothing, searches skip all callbacks when given one of these
+    watching = False
+
+    def mark(self, cell, state):
+        pass
+
+    def step(self):
+        pass
+
+    def finish(self):
+        pass
+
+
+NO_OBSERVER = SearchObserver()
+
+
+class ThrottledObserver(SearchObserver):
+    watching = True
+
+    def __init__(self, draw, every=1, interval=None):
+        self.draw = draw
+        self.every = every
+        self.interval = interval / 1000 if interval is not None else None
+        self.steps = 0
+        self.last_draw = time.perf_counter()
+
+    def step(self):
+        self.steps += 1
+        if self.every and self.steps % self.every == 0:
+            self.redraw()
+        elif self.interval is not None and time.perf_counter() - self.last_draw >= self.interval:
+            self.redraw()
+
+    def finish(self):
+        self.redraw()
+
+    def redraw(self):
+        self.draw()
+        self.last_draw = time.perf_counter()
+
+
+def as_observer(observer):
+    if observer is None:
+        return NO_OBSERVER
+    if isinstance(observer, SearchObserver):
+        return observer
+    return ThrottledObserver(observer)
@@ -0,0 +1,58 @@
+from heapq import heappush, heappop
+
+INF = float("inf")
+
+
+class OpenSet:
+    # Binary heap with lazy deletion. Pushing a cell that is already queued with a
+    # lower priority acts as decrease-key, the old entry is skipped when popped.
+    # Equal priorities pop by the lower tie first, then first in first out. A* passes
+    # its heuristic as tie, so among equal f it goes on from the cell nearest the
+    # goal instead of widening the whole band of equal f.
+    def __init__(self):
+        self.heap = []
+        self.best = {}
+        self.count = 0
+
+    def push(self, cell, priority, tie=0):
+        if priority < self.best.get(cell, INF):
+            self.best[cell] = priority
+            self.count += 1
+            heappush(self.heap, (priority, tie, self.count, cell))
+
+    def update(self, cell, priority):
+        # Like push, but also moves a queued cell to a higher priority
+        if self.best.get(cell) != priority:
+            self.best[cell] = priority
+            self.count += 1
+            heappush(self.heap, (priority, 0, self.count, cell))
+
+    def discard(self, cell):
+        self.best.pop(cell, None)
+
+    def pop(self):
+        heap = self.heap
+        best = self.best
+        while heap:
+            priority, _, _, cell = heappop(heap)
+            if best.get(cell) == priority:
+                del best[cell]
+                return cell
+        raise KeyError("pop from an empty open set")
+
+    def peek(self):
+        # Lowest priority still queued, dropping stale entries from the top
+        heap = self.heap
+        best = self.best
+        while heap:
+            priority, _, _, cell = heap[0]
+            if best.get(cell) == priority:
+                return priority
+            heappop(heap)
+        return INF
+
+    def __contains__(self, cell):
+        return cell in self.best
+
+    def __len__(self):
+        return len(self.best)
@@ -1,13 +1,26 @@
 import pygame
-import pickle
+import numpy as np
 import os
+import grid_engine
+import grid_io
 from algorithms import *
+from observers import SearchObserver, ThrottledObserver
+from search_stats import SearchStats
+from path_cache import PathCache
+from dstar_lite import DStarLite
+from hpa import HPAStar
+from components import ComponentIndex
+from distance_field import distance_matrix
 from antSystem import ant_system
+from antSystem import multi_colony_ant_system
 from antSystem import get_nn_path
 WIDTH = 800
+REDRAW_INTERVAL = 30
+VISUALIZATIONS = ("dirty", "throttled", "none")
 
 DISTANCE = 1
 ROWS = 20
+CLUSTER_SIZE = 5
 
 RED = (255, 117, 109)
 GREEN = (133, 222, 119)
@@ -20,9 +33,12 @@ ORANGE = (255, 180, 71)
 GREY = (135, 92, 54)
 TURQUOISE = (130, 179, 255)
 
-WIN = pygame.display.set_mode((WIDTH, WIDTH))
-pygame.display.set_caption("Grid Path Finding Algorithms")
-
+SEARCH_COLORS = {
+    grid_engine.CLEAR: BLACK,
+    grid_engine.OPEN: GREEN,
+    grid_engine.CLOSED: RED,
+    grid_engine.PATH: PURPLE,
+}
 
 
 class Node:
@@ -32,16 +48,12 @@ class Node:
         self.x = row * width
         self.y = col * width
         self.color = BLACK
-        self.neighbors = []
         self.width = width
         self.total_rows = total_rows
 
     def get_pos(self):
         return self.row, self.col
 
-    def get_neighbors(self):
-        return self.neighbors
-
     def is_closed(self):
         return self.color == RED
 
@@ -84,36 +96,6 @@ class Node:
     def draw(self, win):
         pygame.draw.rect(win, self.color, (self.x, self.y, self.width, self.width))
 
-    def update_neighbors(self, grid, diagonal):
-        self.neighbors = []
-        if self.row < self.total_rows - 1 and not grid[self.row + 1][self.col].is_barrier(): # DOWN
-            self.neighbors.append(grid[self.row + 1][self.col])
-
-        if self.row > 0 and not grid[self.row - 1][self.col].is_barrier(): # UP
-            self.neighbors.append(grid[self.row - 1][self.col])
-
-        if self.col < self.total_rows - 1 and not grid[self.row][self.col + 1].is_barrier(): # RIGHT
-            self.neighbors.append(grid[self.row][self.col + 1])
-
-        if self.col > 0 and not grid[self.row][self.col - 1].is_barrier(): # LEFT
-            self.neighbors.append(grid[self.row][self.col - 1])
-
-        if diagonal:
-            if self.row < self.total_rows - 1 and self.col > 0 and not grid[self.row + 1][self.col - 1].is_barrier(): # Lower Left
-                self.neighbors.append(grid[self.row + 1][self.col - 1])
-
-            if self.row > 0 and self.col > 0 and not grid[self.row - 1][self.col - 1].is_barrier(): # Upper Left
-                self.neighbors.append(grid[self.row - 1][self.col - 1])
-
-            if self.col < self.total_rows - 1 and self.row < self.total_rows - 1 and not grid[self.row + 1][self.col + 1].is_barrier(): # Lower Right
-                self.neighbors.append(grid[self.row + 1][self.col + 1])
-
-            if self.col < self.total_rows - 1 and self.row > 0 and not grid[self.row - 1][self.col + 1].is_barrier(): # Upper Right
-                self.neighbors.append(grid[self.row - 1][self.col + 1])
-
-    def reset_neighbors(self):
-        self.neighbor = []
-
     def __lt__(self, other):
         return False
 
@@ -133,7 +115,6 @@ def reset_searched_nodes(grid):
         for node in row:
             if  not (node.is_start() or node.is_end() or node.is_barrier()):
                 node.reset()
-                node.reset_neighbors()
 
 
 
@@ -145,21 +126,32 @@ def draw_grid(win, rows, width):
         for j in range(rows):
             pygame.draw.line(win, GREY, (j * gap, 0), (j * gap, width))
 
-def draw(win, grid, rows, width, tree=False, path=[], locs=[]):
+def draw(win, grid, rows, width, tree=False, path=[], locs=[], stats=None):
     win.fill(BLACK)
 
     for row in grid:
         for node in row:
             node.draw(win)
             if tree and node.is_barrier():
-                pygame.draw.circle(WIN, (0,0,0), (node.x+node.width//2, node.y+node.width//2), 10)
+                pygame.draw.circle(win, (0,0,0), (node.x+node.width//2, node.y+node.width//2), 10)
     if tree and len(path) > 0 and len(locs) > 0:
         draw_path(win, grid, path, locs)
 
 
     draw_grid(win, rows, width)
+    if stats is not None:
+        draw_stats(win, stats)
     pygame.display.update()
 
+def draw_stats(win, stats):
+    font = pygame.font.SysFont(None, 22)
+    lines = [font.render(line, True, WHITE) for line in stats.summary()]
+    box = pygame.Rect(5, 5, max(line.get_width() for line in lines) + 10, 18 * len(lines) + 8)
+    pygame.draw.rect(win, BLACK, box)
+    pygame.draw.rect(win, GREY, box, 1)
+    for i, line in enumerate(lines):
+        win.blit(line, (10, 9 + 18 * i))
+
 def draw_path(win, grid, path, locs):
     n_locs = len(locs)
     locs_ext = []
@@ -185,10 +177,118 @@ def get_clicked_pos(pos, rows, width):
 
     return row, col
 
-def update_all_neighbors(grid, diagonal):
+def make_engine(grid):
+    engine = grid_engine.Grid.from_walls([[node.is_barrier() for node in row] for row in grid])
+    index_components(engine)
+    return engine
+
+def index_components(engine):
+    # Kept up to date by the clicks, a search for a walled off end then returns at once
+    for diagonal in (False, True):
+        ComponentIndex(engine, diagonal)
+
+def paint_search(grid, engine):
+    state = engine.state_2d()
     for row in grid:
         for node in row:
-            node.update_neighbors(grid, diagonal)
+            if not (node.is_start() or node.is_end() or node.is_barrier()):
+                node.color = SEARCH_COLORS[state[node.row, node.col]]
+
+def draw_search(win, grid, engine, stats=None):
+    pygame.event.pump()
+    paint_search(grid, engine)
+    draw(win, grid, ROWS, WIDTH, stats=stats)
+
+class DirtyRectObserver(SearchObserver):
+    watching = True
+
+    def __init__(self, win, grid):
+        self.win = win
+        self.grid = grid
+        self.dirty = []
+
+    def mark(self, cell, state):
+        row, col = divmod(cell, len(self.grid))
+        node = self.grid[row][col]
+        if not (node.is_start() or node.is_end()):
+            node.color = SEARCH_COLORS[state]
+            self.dirty.append(node)
+
+    def step(self):
+        pygame.event.pump()
+        if not self.dirty:
+            return
+        rects = []
+        for node in self.dirty:
+            rect = pygame.Rect(node.x, node.y, node.width, node.width)
+            node.draw(self.win)
+            pygame.draw.line(self.win, GREY, rect.topleft, rect.topright)
+            pygame.draw.line(self.win, GREY, rect.topleft, rect.bottomleft)
+            rects.append(rect)
+        self.dirty = []
+        pygame.display.update(rects)
+
+    def finish(self):
+        self.step()
+
+def make_observer(visualization, win, grid, engine, stats=None):
+    if visualization == "dirty":
+        reset_searched_nodes(grid)
+        draw(win, grid, ROWS, WIDTH)
+        return DirtyRectObserver(win, grid)
+    if visualization == "throttled":
+        return ThrottledObserver(lambda: draw_search(win, grid, engine, stats), every=None, interval=REDRAW_INTERVAL)
+    return None
+
+def run_search(search, cache, visualization, win, grid, engine, start, end, diagonal, stats=None):
+    # Asking again on unchanged walls shows the cached path instead of searching.
+    # Runs with stats always search, so there is something to measure.
+    start = start.get_pos()
+    end = end.get_pos()
+    if stats is None:
+        hit, path = cache.lookup(search, start, end, diagonal)
+        if hit:
+            show_path(grid, engine, path)
+            return path
+        path = search(make_observer(visualization, win, grid, engine), engine, start, end, diagonal)
+    else:
+        path = search(make_observer(visualization, win, grid, engine, stats), engine, start, end, diagonal, stats)
+    cache.store(search, start, end, diagonal, path)
+    paint_search(grid, engine)
+    return path
+
+def show_path(grid, engine, path):
+    engine.reset_search()
+    for pos in path or []:
+        engine.state[engine.index(pos)] = grid_engine.PATH
+    paint_search(grid, engine)
+
+def paint_walls(grid, engine):
+    walls = engine.walls_2d()
+    for row in grid:
+        for node in row:
+            if node.is_start() or node.is_end():
+                continue
+            if walls[node.row, node.col]:
+                node.make_barrier()
+            else:
+                node.reset()
+
+def make_maze(generator, visualization, win, grid, engine, start, end):
+    # The walls are knocked out live on the engine, the animation repaints from it
+    def redraw():
+        paint_walls(grid, engine)
+        draw(win, grid, ROWS, WIDTH)
+
+    observer = None
+    if visualization != "none":
+        observer = ThrottledObserver(redraw, every=None, interval=REDRAW_INTERVAL)
+    generator(observer, engine)
+    for node in (start, end):
+        if node:
+            for pos in get_maze_entrance(node.get_pos()):
+                engine.set_wall(pos, False)
+    paint_walls(grid, engine)
 
 def make_tree(grid):
     for row in grid:
@@ -206,50 +306,63 @@ def get_locations(grid):
                 locations.append((node.row, node.col))
     return locations
 
-def save_grid(grid):
+def save_grid(grid, engine, start, end):
     reset_searched_nodes(grid)
 
     file_index = 1
-    file_name = F"Grids/example_grid_{file_index}.pkl"
+    file_name = F"Grids/example_grid_{file_index}.grid"
     while os.path.isfile(file_name):
-        file_name = F"Grids/example_grid_{file_index}.pkl"
         file_index += 1
-    with open(file_name, 'wb') as pickle_file:
-        pickle.dump(grid, pickle_file)
+        file_name = F"Grids/example_grid_{file_index}.grid"
+    grid_io.save_grid(file_name, engine, start and start.get_pos(), end and end.get_pos())
 
 def switch_grid(grid_index):
     grid_index += 1
-    start = None
-    end = None
-    file_name = F"Grids/example_grid_{grid_index}.pkl"
+    file_name = F"Grids/example_grid_{grid_index}.grid"
     if  not os.path.isfile(file_name):
         grid_index = 1
-    file_name = F"Grids/example_grid_{grid_index}.pkl"
-    if  os.path.isfile(file_name):
-        with open(file_name, 'rb') as pickle_file:
-            grid = pickle.load(pickle_file)
-            for row in grid:
-                for node in row:
-                    if node.is_start():
-                        start = node
-                    elif node.is_end():
-                        end = node
-    return (grid, start, end, grid_index)
+    file_name = F"Grids/example_grid_{grid_index}.grid"
+    engine, start_pos, end_pos = grid_io.load_grid(file_name)
+    index_components(engine)
+    grid = make_grid(ROWS, WIDTH)
+    for row in grid:
+        for node in row:
+            if engine.is_wall(node.get_pos()):
+                node.make_barrier()
+    start = None
+    end = None
+    if start_pos is not None:
+        start = grid[start_pos[0]][start_pos[1]]
+        start.make_start()
+    if end_pos is not None:
+        end = grid[end_pos[0]][end_pos[1]]
+        end.make_end()
+    return (grid, engine, start, end, grid_index)
 
 def main():
+    pygame.init()
+    WIN = pygame.display.set_mode((WIDTH, WIDTH))
+    pygame.display.set_caption("Grid Path Finding Algorithms")
     grid = make_grid(ROWS, WIDTH)
+    engine = make_engine(grid)
+    cache = PathCache(engine)
 
     start = None
     end = None
     run = True
     diagonal = False
+    visualization = VISUALIZATIONS[0]
     tree = False
     grid_index = 0
     path = []
     locs = []
+    show_stats = False
+    stats = None
+    planner = None
+    hierarchy = None
 
     while run:
-        draw(WIN, grid, ROWS,  WIDTH, tree, path, locs)
+        draw(WIN, grid, ROWS,  WIDTH, tree, path, locs, stats if show_stats else None)
         for event in pygame.event.get():
 
             if event.type == pygame.QUIT:
@@ -270,59 +383,121 @@ def main():
 
                 if (node != end and node != start) or tree:
                     node.make_barrier()
+                version = engine.version
+                engine.set_wall(node.get_pos(), node.is_barrier())
+                if hierarchy is not None and engine.version != version:
+                    hierarchy.update_cells([node.get_pos()])
+                if planner is not None and engine.version != version:
+                    planner.update_cells([node.get_pos()])
+                    show_path(grid, engine, planner.compute_path())
 
             if pygame.mouse.get_pressed()[2]: # RIGHT
                 pos = pygame.mouse.get_pos()
                 row, col = get_clicked_pos(pos, ROWS, WIDTH)
                 node = grid[row][col]
                 node.reset()
+                version = engine.version
+                engine.set_wall(node.get_pos(), False)
 
                 if node == start:
                     start = None
                 if node == end:
                     end = None
+                if hierarchy is not None and engine.version != version:
+                    hierarchy.update_cells([node.get_pos()])
+                if planner is not None and not (start and end):
+                    planner = None
+                    reset_searched_nodes(grid)
+                elif planner is not None and engine.version != version:
+                    planner.update_cells([node.get_pos()])
+                    show_path(grid, engine, planner.compute_path())
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_a and start and end:
-                    reset_searched_nodes(grid)
-                    update_all_neighbors(grid, diagonal)
-                    a_star(lambda: draw(WIN, grid, ROWS, WIDTH), grid, start, end)
+                    stats = SearchStats() if show_stats else None
+                    run_search(a_star, cache, visualization, WIN, grid, engine, start, end, diagonal, stats)
 
                 if event.key == pygame.K_d and start and end:
-                    reset_searched_nodes(grid)
-                    update_all_neighbors(grid, diagonal)
-                    dijkstra(lambda: draw(WIN, grid, ROWS, WIDTH), grid, start, end)
+                    stats = SearchStats() if show_stats else None
+                    run_search(dijkstra, cache, visualization, WIN, grid, engine, start, end, diagonal, stats)
 
                 if event.key == pygame.K_b and start and end:
-                    reset_searched_nodes(grid)
-                    update_all_neighbors(grid, diagonal)
-                    breadth_first_search(lambda: draw(WIN, grid, ROWS, WIDTH), start, end)
+                    run_search(breadth_first_search, cache, visualization, WIN, grid, engine, start, end, diagonal)
 
                 if event.key == pygame.K_j and start and end:
-                    reset_searched_nodes(grid)
-                    update_all_neighbors(grid, diagonal)
-                    depth_first_search(lambda: draw(WIN, grid, ROWS, WIDTH), start, end)
+                    run_search(depth_first_search, cache, visualization, WIN, grid, engine, start, end, diagonal)
+
+                if event.key == pygame.K_p and start and end:
+                    run_search(jump_point_search, cache, visualization, WIN, grid, engine, start, end, diagonal)
+
+                if event.key == pygame.K_h and start and end:
+                    # HPA*: the clusters are built once and then kept up to date by the clicks
+                    if hierarchy is None:
+                        hierarchy = HPAStar(engine, CLUSTER_SIZE, diagonal)
+                    show_path(grid, engine, hierarchy.find_path(start.get_pos(), end.get_pos()))
+
+                if event.key in (pygame.K_k, pygame.K_o):
+                    generator = kruskals if event.key == pygame.K_k else prims
+                    make_maze(generator, visualization, WIN, grid, engine, start, end)
+                    planner = None
+                    hierarchy = None
 
                 if event.key == pygame.K_n:
                     diagonal = not diagonal
+                    hierarchy = None
+                    if planner is not None:
+                        planner = DStarLite(engine, start.get_pos(), end.get_pos(), diagonal)
+                        show_path(grid, engine, planner.compute_path())
+
+                if event.key == pygame.K_l:
+                    # D* Lite mode: the path is repaired after every click
+                    if planner is None and start and end:
+                        planner = DStarLite(engine, start.get_pos(), end.get_pos(), diagonal)
+                        show_path(grid, engine, planner.compute_path())
+                    else:
+                        planner = None
+                        reset_searched_nodes(grid)
+
+                if event.key == pygame.K_i:
+                    show_stats = not show_stats
+
+                if event.key == pygame.K_v:
+                    visualization = VISUALIZATIONS[(VISUALIZATIONS.index(visualization) + 1) % len(VISUALIZATIONS)]
+                    print(f'Visualization: {visualization}')
 
                 if event.key == pygame.K_t:
                     tree = not tree
 
                 if event.key == pygame.K_m:
                     make_tree(grid)
+                    engine = make_engine(grid)
+                    cache = PathCache(engine)
+                    planner = None
+                    hierarchy = None
 
                 if event.key == pygame.K_y:
                     tree = True
                     locs = get_locations(grid)
                     
                     path, path_length = get_nn_path(locs)
+                    # Route around the other cells when every location can reach every other
+                    distances = distance_matrix(engine, locs, diagonal)
+                    if np.isinf(distances).any():
+                        distances = None
 
-                    for (iteration, ant, path_length, path) in ant_system(locs):
+                    for (iteration, ant, path_length, path) in ant_system(locs, distances=distances):
+                        print(f'Iteration: {iteration} Ant: {ant} Length: {path_length}')
+                        draw(WIN, grid, ROWS,  WIDTH, tree, path, locs)
+                    print('Done')
+
+                if event.key == pygame.K_u:
+                    tree = True
+                    locs = get_locations(grid)
+
+                    for (iteration, ant, path_length, path) in multi_colony_ant_system(locs):
                         print(f'Iteration: {iteration} Ant: {ant} Length: {path_length}')
                         draw(WIN, grid, ROWS,  WIDTH, tree, path, locs)
                     print('Done')
-                    
 
                 if event.key == pygame.K_c:
                     start = None
@@ -332,6 +507,10 @@ def main():
                     tree = False
                     #reset_searched_nodes(grid)
                     grid = make_grid(ROWS, WIDTH)
+                    engine = make_engine(grid)
+                    cache = PathCache(engine)
+                    planner = None
+                    hierarchy = None
 
                 if event.key == pygame.K_r:
                     reset_searched_nodes(grid)
@@ -340,10 +519,13 @@ def main():
                     run = False
 
                 if event.key == pygame.K_s:
-                    save_grid(grid)
+                    save_grid(grid, engine, start, end)
 
                 if event.key == pygame.K_g:
-                    grid, start, end, grid_index = switch_grid(grid_index)
+                    grid, engine, start, end, grid_index = switch_grid(grid_index)
+                    cache = PathCache(engine)
+                    planner = None
+                    hierarchy = None
 
 
 
@@ -351,4 +533,5 @@ def main():
 
     pygame.quit()
 
-main()
+if __name__ == "__main__":
+    main()
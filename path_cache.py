@@ -0,0 +1,69 @@
+from collections import OrderedDict
+import numpy as np
+
+
+class PathCache:
+    # LRU cache of search results on one grid, keyed on (grid.version, start, end,
+    # search name, diagonal). After walls change, a cached path is reused as long as
+    # no wall was removed since (that could open a shorter path) and none of its
+    # cells became a wall.
+    def __init__(self, grid, max_size=4096):
+        self.grid = grid
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def find_path(self, search, start, end, diagonal=False, observer=None):
+        hit, path = self.lookup(search, start, end, diagonal)
+        if not hit:
+            path = search(observer, self.grid, start, end, diagonal)
+            self.store(search, start, end, diagonal, path)
+        return path
+
+    def lookup(self, search, start, end, diagonal=False):
+        # Returns (hit, path), path is None for a cached unreachable end
+        query = (tuple(start), tuple(end), search.__name__, diagonal)
+        version = self.versions.get(query)
+        if version is None:
+            self.misses += 1
+            return False, None
+        key = (version,) + query
+        path, cells = self.entries[key]
+        if version != self.grid.version:
+            del self.entries[key]
+            if not self.is_valid(version, cells):
+                del self.versions[query]
+                self.misses += 1
+                return False, None
+            key = (self.grid.version,) + query
+            self.entries[key] = (path, cells)
+            self.versions[query] = self.grid.version
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return True, None if path is None else list(path)
+
+    def store(self, search, start, end, diagonal, path):
+        grid = self.grid
+        query = (tuple(start), tuple(end), search.__name__, diagonal)
+        if query in self.versions:
+            del self.entries[(self.versions[query],) + query]
+        cells = None
+        if path is not None:
+            path = list(path)
+            cells = np.array([row * grid.cols + col for row, col in path], dtype=np.intp)
+        self.entries[(grid.version,) + query] = (path, cells)
+        self.versions[query] = grid.version
+        if len(self.entries) > self.max_size:
+            key, entry = self.entries.popitem(last=False)
+            del self.versions[key[1:]]
+
+    def is_valid(self, version, cells):
+        if self.grid.cleared_version > version:
+            return False
+        return cells is None or not self.grid.walls[cells].any()
+
+    def clear(self):
+        self.entries.clear()
+        self.versions.clear()
@@ -0,0 +1,78 @@
+# Stand-in client for path_server.py: sends random queries between free cells of the
+# grid the server was started with, all at once over one connection, and prints
+# one line per response followed by a summary.
+# Run from the repository root: python path_client.py Grids/example_grid_1.grid [--queries 20]
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+from path_server import SEARCHES, load_any_grid
+
+
+def make_queries(grid, n_queries, algorithms, diagonal=False, seed=None):
+    rng = np.random.default_rng(seed)
+    free = np.flatnonzero(grid.walls == 0)
+    queries = []
+    for query_id in range(n_queries):
+        start, end = rng.choice(free, size=2)
+        queries.append({
+            "id": query_id,
+            "start": list(grid.pos(start)),
+            "end": list(grid.pos(end)),
+            "algorithm": algorithms[query_id % len(algorithms)],
+            "diagonal": diagonal,
+        })
+    return queries
+
+
+async def request_paths(queries, host="127.0.0.1", port=8765):
+    # Returns the responses in the order they arrived
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for query in queries:
+            writer.write(json.dumps(query).encode() + b"\n")
+        await writer.drain()
+        responses = []
+        while len(responses) < len(queries):
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError(f"server closed after {len(responses)} of {len(queries)} responses")
+            responses.append(json.loads(line))
+        return responses
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("grid", nargs="?", default=os.path.join("Grids", "example_grid_1.grid"),
+                        help="the grid the server serves, to pick free cells from")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--algorithms", nargs="+", choices=tuple(SEARCHES), default=("a_star",))
+    parser.add_argument("--diagonal", action="store_true")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    grid = load_any_grid(args.grid)
+    queries = make_queries(grid, args.queries, args.algorithms, args.diagonal, args.seed)
+    start_time = time.perf_counter()
+    responses = asyncio.run(request_paths(queries, args.host, args.port))
+    elapsed = time.perf_counter() - start_time
+    for response in responses:
+        if "error" in response:
+            print(f"{response['id']}: error {response['error']}")
+        else:
+            print(f"{response['id']}: found {response['found']} length {response['path_length']} "
+                  f"expansions {response['expansions']} {response['time_ms']:.1f} ms")
+    errors = sum("error" in response for response in responses)
+    print(f"{len(responses)} responses, {errors} errors in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# Answers path queries over one grid without the pygame app. The grid is loaded
+# once into shared memory, the searches run in a process pool whose workers map
+# that memory instead of receiving the grid with every query.
+# Run from the repository root: python path_server.py Grids/example_grid_1.grid [--port 8765]
+#
+# The protocol is one JSON object per line each way. A request names
+#   {"id": 1, "start": [row, col], "end": [row, col], "algorithm": "a_star", "diagonal": false}
+# and its response carries the same id with found, path, path_length, path_cost,
+# expansions and time_ms, plus stats for a_star and dijkstra, or an error. Responses
+# come back as the searches finish, not in request order.
+import argparse
+import asyncio
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import grid_io
+import movingai
+from grid_engine import Grid
+from algorithms import (path_cost, a_star, dijkstra, breadth_first_search, depth_first_search,
+                        jump_point_search, bidirectional_a_star, bidirectional_breadth_first_search)
+from search_stats import SearchStats
+
+SEARCHES = {
+    "a_star": a_star,
+    "dijkstra": dijkstra,
+    "breadth_first_search": breadth_first_search,
+    "depth_first_search": depth_first_search,
+    "jump_point_search": jump_point_search,
+    "bidirectional_a_star": bidirectional_a_star,
+    "bidirectional_breadth_first_search": bidirectional_breadth_first_search,
+}
+# The searches that can fill in a SearchStats
+STATS_SEARCHES = ("a_star", "dijkstra")
+
+
+def load_any_grid(file_name):
+    # .grid files from Grids/ or MovingAI .map files
+    if file_name.endswith(".map"):
+        return movingai.load_map(file_name)
+    grid, start, end = grid_io.load_grid(file_name)
+    return grid
+
+
+def get_shared_arrays(buffer, size):
+    # walls, masks and costs one after the other, costs starting 8 byte aligned
+    costs_offset = (2 * size + 7) // 8 * 8
+    walls = np.ndarray(size, dtype=np.uint8, buffer=buffer)
+    masks = np.ndarray(size, dtype=np.uint8, buffer=buffer, offset=size)
+    costs = np.ndarray(size, dtype=np.float32, buffer=buffer, offset=costs_offset)
+    return walls, masks, costs
+
+
+def share_grid(grid):
+    # The caller closes and unlinks the returned block
+    memory = SharedMemory(create=True, size=(2 * grid.size + 7) // 8 * 8 + 4 * grid.size)
+    walls, masks, costs = get_shared_arrays(memory.buf, grid.size)
+    walls[:] = grid.walls
+    masks[:] = grid.masks
+    costs[:] = grid.costs
+    del walls, masks, costs
+    return memory
+
+
+worker_data = {}
+
+def init_search_worker(name, rows, cols):
+    # The worker's grid reads walls, masks and costs from the shared block, only the
+    # search state and parents are its own
+    memory = SharedMemory(name=name)
+    grid = Grid(rows, cols)
+    grid.walls, grid.masks, grid.costs = get_shared_arrays(memory.buf, grid.size)
+    worker_data["memory"] = memory
+    worker_data["grid"] = grid
+
+
+def run_query(start, end, algorithm, diagonal):
+    grid = worker_data["grid"]
+    search = SEARCHES[algorithm]
+    stats = SearchStats() if algorithm in STATS_SEARCHES else None
+    start_time = time.perf_counter()
+    if stats is None:
+        path = search(None, grid, start, end, diagonal)
+    else:
+        path = search(None, grid, start, end, diagonal, stats)
+    elapsed = time.perf_counter() - start_time
+    result = {
+        "found": path is not None,
+        "path": path,
+        "path_length": len(path) - 1 if path is not None else None,
+        "path_cost": path_cost(grid, path) if path is not None else None,
+        "expansions": stats.expanded if stats is not None else grid.expanded,
+        "time_ms": elapsed * 1000,
+    }
+    if stats is not None:
+        result["stats"] = stats.as_dict()
+    return result
+
+
+def parse_request(request, rows, cols):
+    # Returns the run_query arguments, raises ValueError for a bad request
+    if not isinstance(request, dict):
+        raise ValueError("a request is a JSON object")
+    algorithm = request.get("algorithm", "a_star")
+    if algorithm not in SEARCHES:
+        raise ValueError(f"unknown algorithm {algorithm!r}, expected one of {', '.join(SEARCHES)}")
+    cells = []
+    for key in ("start", "end"):
+        pos = request.get(key)
+        if (not isinstance(pos, list) or len(pos) != 2 or
+                not all(isinstance(value, int) and not isinstance(value, bool) for value in pos)):
+            raise ValueError(f"{key} must be [row, col]")
+        if not (0 <= pos[0] < rows and 0 <= pos[1] < cols):
+            raise ValueError(f"{key} {pos} is off the {rows}x{cols} grid")
+        cells.append(tuple(pos))
+    return cells[0], cells[1], algorithm, bool(request.get("diagonal", False))
+
+
+async def answer(line, writer, executor, rows, cols):
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as error:
+        request = None
+        response = {"error": f"not JSON: {error}"}
+    if request is not None:
+        try:
+            query = parse_request(request, rows, cols)
+            response = await asyncio.get_running_loop().run_in_executor(executor, run_query, *query)
+        except ValueError as error:
+            response = {"error": str(error)}
+    response["id"] = request.get("id") if isinstance(request, dict) else None
+    writer.write(json.dumps(response).encode() + b"\n")
+    await writer.drain()
+
+
+async def handle_client(reader, writer, executor, rows, cols):
+    # Every line is answered in its own task, so one slow search doesn't hold up the
+    # rest of the connection
+    tasks = set()
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                task = asyncio.create_task(answer(line, writer, executor, rows, cols))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(grid, host="127.0.0.1", port=8765, max_workers=None, ready=None):
+    # Runs until cancelled. ready, if given, is called with the listening address.
+    memory = share_grid(grid)
+    try:
+        with ProcessPoolExecutor(max_workers, initializer=init_search_worker,
+                                 initargs=(memory.name, grid.rows, grid.cols)) as executor:
+            server = await asyncio.start_server(
+                lambda reader, writer: handle_client(reader, writer, executor, grid.rows, grid.cols),
+                host, port)
+            loop = asyncio.get_running_loop()
+            for signal_number in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(signal_number, server.close)
+                except (NotImplementedError, RuntimeError):
+                    pass  # Windows, Ctrl+C then ends asyncio.run instead
+            async with server:
+                if ready is not None:
+                    ready(server.sockets[0].getsockname()[:2])
+                try:
+                    await server.serve_forever()
+                except asyncio.CancelledError:
+                    pass
+    finally:
+        memory.close()
+        memory.unlink()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("grid", nargs="?", default=os.path.join("Grids", "example_grid_1.grid"),
+                        help=".grid or MovingAI .map file")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="search processes (default: one per CPU)")
+    args = parser.parse_args()
+
+    grid = load_any_grid(args.grid)
+    ready = lambda address: print(f"Serving {args.grid} ({grid.rows}x{grid.cols}) on {address[0]}:{address[1]}",
+                                  flush=True)
+    try:
+        asyncio.run(serve(grid, args.host, args.port, args.workers, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+PHASES = ("heap", "neighbors", "heuristic", "observer", "path")
+
+
+class SearchStats:
+    # Filled in by a_star/dijkstra when passed as stats. The counters are updated as
+    # the search runs, so an observer can show them live. Timers are in seconds, and
+    # reusing one SearchStats sums up several searches.
+    def __init__(self):
+        self.expanded = 0
+        self.generated = 0
+        self.reopened = 0
+        self.heap_high_water = 0
+        self.timers = dict.fromkeys(PHASES, 0.0)
+        self.total = 0.0
+
+    def as_dict(self):
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "reopened": self.reopened,
+            "heap_high_water": self.heap_high_water,
+            "total": self.total,
+            **{phase + "_time": seconds for phase, seconds in self.timers.items()},
+        }
+
+    def summary(self):
+        lines = [f"expanded {self.expanded}", f"generated {self.generated}",
+                 f"reopened {self.reopened}", f"heap max {self.heap_high_water}"]
+        lines += [f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in self.timers.items()]
+        lines.append(f"total {self.total * 1000:.1f} ms")
+        return lines
+
+    def __repr__(self):
+        return f"SearchStats({', '.join(self.summary())})"